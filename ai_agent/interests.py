@@ -0,0 +1,109 @@
+# backend/ai_agent/interests.py
+import time
+
+import numpy as np
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from posts.models import Post
+from .models import UserInterest
+from .search import similar_post_ids
+
+# 不同事件对兴趣向量的影响程度 (滑动平均的权重 alpha)
+# 新向量 = (1 - alpha) * 旧向量 + alpha * 帖子向量，然后归一化
+EVENT_WEIGHTS = {
+    'upvote': 0.2,
+    'comment': 0.15,
+    'view': 0.05,
+}
+
+# 每个用户最多记住最近看过的多少个帖子 (Redis 有序集合)
+SEEN_LIMIT = 1000
+SEEN_TTL = 60 * 60 * 24 * 30
+
+# 推荐时只排除最近看过的这么多个帖子 (再早看过的允许重新出现，候选数也因此有上限)
+SEEN_FILTER_LIMIT = 200
+
+# 一次最多从向量索引里取多少候选
+MAX_CANDIDATES = 500
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def apply_interest_event(user_id, post_id, event):
+    """
+    把一次 点赞 / 评论 / 浏览 事件增量合并进用户的兴趣向量
+    """
+    alpha = EVENT_WEIGHTS[event]
+    embedding = Post.objects.filter(id=post_id).values_list('embedding', flat=True).first()
+    if embedding is None:
+        # 帖子还没有向量，这次事件就忽略
+        return False
+
+    post_vector = _normalize(np.asarray(embedding, dtype=np.float32))
+
+    with transaction.atomic():
+        # 第一次事件直接用帖子向量建行；并发的第一次事件 get_or_create 会在唯一冲突后取到对方建好的行
+        interest, created = UserInterest.objects.get_or_create(
+            user_id=user_id, defaults={'vector': post_vector, 'event_count': 1}
+        )
+        if created:
+            return True
+
+        # 行锁：同一个用户的并发事件按顺序合并 (重新读取，拿到锁之后的最新向量)
+        interest = UserInterest.objects.select_for_update().get(user_id=user_id)
+
+        old_vector = np.asarray(interest.vector, dtype=np.float32)
+        interest.vector = _normalize((1 - alpha) * old_vector + alpha * post_vector)
+        interest.event_count += 1
+        interest.save(update_fields=['vector', 'event_count', 'updated_at'])
+    return True
+
+
+def _seen_key(user_id):
+    return f'ai_agent:seen:{user_id}'
+
+
+def mark_seen(user_id, post_id):
+    """
+    记录用户看过某个帖子，返回 True 表示这是第一次看
+    """
+    redis = get_redis_connection('default')
+    key = _seen_key(user_id)
+    pipe = redis.pipeline()
+    pipe.zadd(key, {post_id: time.time()})
+    # 只保留最近的 SEEN_LIMIT 个
+    pipe.zremrangebyrank(key, 0, -SEEN_LIMIT - 1)
+    pipe.expire(key, SEEN_TTL)
+    added, _, _ = pipe.execute()
+    return bool(added)
+
+
+def seen_post_ids(user_id, limit=SEEN_FILTER_LIMIT):
+    """
+    最近看过的 limit 个帖子 ID
+    """
+    redis = get_redis_connection('default')
+    return {int(post_id) for post_id in redis.zrevrange(_seen_key(user_id), 0, limit - 1)}
+
+
+def for_you_candidate_ids(user, n):
+    """
+    "猜你喜欢" 的候选帖子 ID (按和兴趣向量的相似度排序，已去掉看过的)
+    n 是最终需要的数量，返回的候选会多一些，方便调用方再做拉黑过滤
+    还没有兴趣向量、或者去掉看过的之后不足 n 个 (看得很多的用户) 时返回 None，调用方改用默认排序
+    """
+    vector = UserInterest.objects.filter(user_id=user.id).values_list('vector', flat=True).first()
+    if vector is None:
+        return None
+
+    seen = seen_post_ids(user.id)
+    # 多取一些，给"看过的"和被拉黑的作者留出余量
+    post_ids = similar_post_ids(vector, min(n * 2 + len(seen), MAX_CANDIDATES))
+    post_ids = [post_id for post_id in post_ids if post_id not in seen]
+    if len(post_ids) < n:
+        return None
+    return post_ids
@@ -0,0 +1,145 @@
+# backend/ai_agent/management/commands/backfill_embeddings.py
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from posts.models import Post
+from ai_agent.tasks import EMBEDDING_FIELDS, compute_post_neighbors
+from ai_agent.search import bulk_save_post_vectors
+from ai_agent.utils import get_embeddings, build_embedding_text, estimate_tokens
+
+# 断点续跑用的缓存 key (记录最后一个处理完的帖子 ID)
+CHECKPOINT_KEY = 'ai_agent:backfill_embeddings:last_id'
+
+# DashScope 单次请求最多接受 25 条文本
+MAX_BATCH_SIZE = 25
+
+
+class RateLimiter:
+    """
+    同时限制"每秒请求数"和"每分钟 token 数"的简单限速器
+    """
+
+    def __init__(self, requests_per_second, tokens_per_minute):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0
+        self.tokens_per_minute = tokens_per_minute
+        self.last_request_at = 0.0
+        # 最近 60 秒内的 (时间, token 数) 记录
+        self.window = []
+
+    def wait(self, tokens):
+        # 1. 请求间隔
+        now = time.monotonic()
+        delay = self.last_request_at + self.min_interval - now
+
+        # 2. token 预算 (滑动窗口)
+        if self.tokens_per_minute > 0:
+            self.window = [(t, n) for t, n in self.window if t > now - 60]
+            used = sum(n for _, n in self.window)
+            if self.window and used + tokens > self.tokens_per_minute:
+                # 等到最早的一批请求滑出窗口
+                delay = max(delay, self.window[0][0] + 60 - now)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        self.last_request_at = time.monotonic()
+        self.window.append((self.last_request_at, tokens))
+
+
+class Command(BaseCommand):
+    help = '为缺少向量或向量已过期的帖子批量生成 Embedding (可限速、可断点续跑)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                            help=f'每次请求的帖子数 (最多 {MAX_BATCH_SIZE})')
+        parser.add_argument('--rps', type=float, default=2.0, help='每秒最多请求数 (0 表示不限)')
+        parser.add_argument('--tpm', type=int, default=100000, help='每分钟最多 token 数 (0 表示不限)')
+        parser.add_argument('--limit', type=int, default=0, help='最多处理多少个帖子 (0 表示全部)')
+        parser.add_argument('--retries', type=int, default=3, help='单批失败后的重试次数')
+        parser.add_argument('--reset', action='store_true', help='忽略之前的断点，从头开始')
+        parser.add_argument('--neighbors', action='store_true', help='同时为这些帖子计算相关帖子')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise CommandError(f'--batch-size 必须在 1 到 {MAX_BATCH_SIZE} 之间')
+
+        if options['reset']:
+            cache.delete(CHECKPOINT_KEY)
+        last_id = cache.get(CHECKPOINT_KEY, 0)
+
+        # 缺少向量，或者帖子在生成向量之后又被修改过
+        queryset = Post.objects.filter(
+            Q(embedding__isnull=True) | Q(embedded_at__lt=F('updated_at'))
+        ).order_by('id')
+
+        total = queryset.filter(id__gt=last_id).count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        if not total:
+            self.stdout.write(self.style.SUCCESS('没有需要处理的帖子。'))
+            return
+
+        self.stdout.write(f'共 {total} 个帖子需要处理 (从 ID > {last_id} 开始)')
+
+        embeddings = get_embeddings()
+        limiter = RateLimiter(options['rps'], options['tpm'])
+        done = 0
+        started_at = time.monotonic()
+
+        while done < total:
+            # 键集分页：每次只取 ID 大于断点的下一批，不用 OFFSET
+            size = min(batch_size, total - done)
+            posts = list(queryset.filter(id__gt=last_id).only('id', 'title', 'content')[:size])
+            if not posts:
+                break
+
+            texts = [build_embedding_text(post) for post in posts]
+            limiter.wait(sum(estimate_tokens(text) for text in texts))
+            vectors = self.embed_with_retry(embeddings, texts, options['retries'])
+
+            now = timezone.now()
+            for post, vector in zip(posts, vectors):
+                post.embedding = vector
+                post.embedded_at = now
+            # bulk_update 不会触发 post_save，不会再为每个帖子排队一个 Celery 任务
+            Post.objects.bulk_update(posts, EMBEDDING_FIELDS)
+            bulk_save_post_vectors(posts)
+
+            if options['neighbors']:
+                for post in posts:
+                    compute_post_neighbors.delay(post.id)
+
+            # 记录断点：崩溃后重新运行会从这里继续
+            last_id = posts[-1].id
+            cache.set(CHECKPOINT_KEY, last_id, timeout=None)
+
+            done += len(posts)
+            elapsed = time.monotonic() - started_at
+            rate = done / elapsed if elapsed else 0
+            eta = (total - done) / rate if rate else 0
+            self.stdout.write(
+                f'[{done}/{total}] 最后 ID={last_id}  {rate:.1f} 帖/秒  预计剩余 {eta:.0f} 秒'
+            )
+
+        if not options['limit']:
+            # 全部跑完了，下次从头检查 (新过期的帖子可能 ID 更小)
+            cache.delete(CHECKPOINT_KEY)
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(f'完成：处理 {done} 个帖子，用时 {elapsed:.1f} 秒'))
+
+    def embed_with_retry(self, embeddings, texts, retries):
+        for attempt in range(retries + 1):
+            try:
+                return embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == retries:
+                    # 断点已经保存，修好问题后重新运行即可继续
+                    raise CommandError(f'调用 Embedding 接口失败: {e}')
+                wait = 2 ** attempt
+                self.stderr.write(f'调用失败 ({e})，{wait} 秒后重试...')
+                time.sleep(wait)
@@ -0,0 +1,78 @@
+# backend/ai_agent/management/commands/bench_for_you.py
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from posts.models import Post
+from posts.views import PostViewSet
+from topics.models import Topic
+from users.models import User
+from ai_agent.models import PostVector, UserInterest, EMBEDDING_DIMENSIONS
+from ai_agent.search import bulk_save_post_vectors
+
+BENCH_USERNAME = 'bench_for_you'
+BENCH_TOPIC_SLUG = 'bench-for-you'
+
+
+class Command(BaseCommand):
+    help = '在合成数据上压测 /posts/for_you/ 接口的延迟 (p50 / p95)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='先生成多少个合成帖子 (例如 1000000)，0 表示直接使用已有数据')
+        parser.add_argument('--clusters', type=int, default=200, help='合成向量的聚类中心数量')
+        parser.add_argument('--requests', type=int, default=200, help='压测请求次数')
+        parser.add_argument('--limit', type=int, default=20, help='每次请求返回的帖子数')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        centroids = rng.standard_normal((options['clusters'], EMBEDDING_DIMENSIONS)).astype(np.float32)
+
+        author, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        if options['seed']:
+            self.seed_posts(author, options['seed'], centroids, rng)
+
+        self.stdout.write(f"帖子总数: {Post.objects.count()}  压缩向量: {PostVector.objects.count()}")
+
+        # 压测用户：兴趣向量取某个聚类中心
+        viewer, _ = User.objects.get_or_create(username=f'{BENCH_USERNAME}_viewer')
+        vector = centroids[0] / np.linalg.norm(centroids[0])
+        UserInterest.objects.update_or_create(user=viewer, defaults={'vector': vector, 'event_count': 1})
+
+        factory = APIRequestFactory()
+        view = PostViewSet.as_view({'get': 'for_you'})
+        latencies = []
+        for _ in range(options['requests']):
+            request = factory.get('/api/v1/posts/for_you/', {'limit': options['limit']})
+            force_authenticate(request, user=viewer)
+            started_at = time.perf_counter()
+            response = view(request)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            assert response.status_code == 200, response.data
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(latencies)} 次请求  p50: {statistics.median(latencies):.1f} ms  '
+            f'p95: {p95:.1f} ms  max: {latencies[-1]:.1f} ms'
+        ))
+
+    def seed_posts(self, author, count, centroids, rng, batch_size=2000):
+        topic, _ = Topic.objects.get_or_create(slug=BENCH_TOPIC_SLUG, defaults={'name': BENCH_TOPIC_SLUG})
+        created = 0
+        started_at = time.monotonic()
+        while created < count:
+            size = min(batch_size, count - created)
+            # 每个帖子 = 随机聚类中心 + 噪声，模拟真实数据里"相似内容扎堆"的分布
+            labels = rng.integers(0, len(centroids), size)
+            vectors = centroids[labels] + 0.5 * rng.standard_normal((size, EMBEDDING_DIMENSIONS)).astype(np.float32)
+            posts = Post.objects.bulk_create([
+                Post(title=f'bench {created + i}', content='bench', author=author, topic=topic, embedding=vector)
+                for i, vector in enumerate(vectors)
+            ])
+            bulk_save_post_vectors(posts)
+            created += size
+            self.stdout.write(f'已生成 {created}/{count}  ({created / (time.monotonic() - started_at):.0f} 帖/秒)')
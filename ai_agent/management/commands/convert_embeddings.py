@@ -0,0 +1,48 @@
+# backend/ai_agent/management/commands/convert_embeddings.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from ai_agent.models import PostVector
+from ai_agent.search import bulk_save_post_vectors
+
+
+class Command(BaseCommand):
+    help = '把已有的 Post.embedding 转换成半精度 / 二值量化副本 (写入 PostVector)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的帖子数')
+        parser.add_argument('--rebuild', action='store_true', help='先清空 PostVector 再全部重新转换')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['rebuild']:
+            PostVector.objects.all().delete()
+            queryset = Post.objects.filter(embedding__isnull=False)
+        else:
+            # 默认只转换还没有压缩副本的帖子
+            queryset = Post.objects.filter(embedding__isnull=False, compact_vector__isnull=True)
+        queryset = queryset.order_by('id').only('id', 'embedding')
+
+        total = queryset.count()
+        self.stdout.write(f'共 {total} 个帖子需要转换')
+
+        last_id = 0
+        done = 0
+        started_at = time.monotonic()
+        while True:
+            # 键集分页，避免大 OFFSET
+            posts = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not posts:
+                break
+
+            bulk_save_post_vectors(posts)
+
+            last_id = posts[-1].id
+            done += len(posts)
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(f'[{done}/{total}] 最后 ID={last_id}  {done / elapsed:.0f} 帖/秒')
+
+        self.stdout.write(self.style.SUCCESS(f'完成：转换 {done} 个帖子'))
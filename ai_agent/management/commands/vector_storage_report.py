@@ -0,0 +1,89 @@
+# backend/ai_agent/management/commands/vector_storage_report.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.models import Post
+from ai_agent.models import PostVector
+from ai_agent.search import similar_post_ids
+
+
+class Command(BaseCommand):
+    help = '对比 float32 / halfvec / binary 三种向量存储的占用空间、召回率和查询延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=100, help='抽样多少个帖子作为查询')
+        parser.add_argument('-k', type=int, default=10, help='每次查询返回的数量')
+
+    def handle(self, *args, **options):
+        if not PostVector.objects.exists():
+            raise CommandError('PostVector 为空，请先运行 python manage.py convert_embeddings')
+
+        self.report_storage()
+        self.report_search(options['queries'], options['k'])
+
+    def report_storage(self):
+        self.stdout.write(self.style.MIGRATE_HEADING('== 存储占用 =='))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT avg(pg_column_size(embedding)) FROM posts_post WHERE embedding IS NOT NULL"
+            )
+            float_size = cursor.fetchone()[0] or 0
+            cursor.execute(
+                "SELECT avg(pg_column_size(embedding_half)), avg(pg_column_size(embedding_bits)) "
+                "FROM ai_agent_postvector"
+            )
+            half_size, bits_size = cursor.fetchone()
+            self.stdout.write(f'平均每行  float32: {float_size:.0f} B  halfvec: {half_size:.0f} B  binary: {bits_size:.0f} B')
+
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_total_relation_size('posts_post')), "
+                "pg_size_pretty(pg_total_relation_size('ai_agent_postvector'))"
+            )
+            posts_total, vectors_total = cursor.fetchone()
+            self.stdout.write(f'表总大小  posts_post: {posts_total}  ai_agent_postvector: {vectors_total}')
+
+            cursor.execute(
+                "SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) "
+                "FROM pg_indexes WHERE tablename = 'ai_agent_postvector' ORDER BY indexname"
+            )
+            for name, size in cursor.fetchall():
+                self.stdout.write(f'索引      {name}: {size}')
+
+    def report_search(self, num_queries, k):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== 召回率 / 延迟 (k={k}) =='))
+        ids = list(Post.objects.filter(embedding__isnull=False).values_list('id', flat=True))
+        sample = random.sample(ids, min(num_queries, len(ids)))
+        queries = Post.objects.filter(id__in=sample).only('id', 'embedding')
+
+        latencies = {mode: [] for mode in ('exact', 'halfvec', 'binary')}
+        recalls = {mode: [] for mode in ('halfvec', 'binary')}
+        for post in queries:
+            others = Post.objects.exclude(id=post.id)
+            truth = None
+            for mode in latencies:
+                started_at = time.perf_counter()
+                result = similar_post_ids(post.embedding, k, others, mode=mode)
+                latencies[mode].append((time.perf_counter() - started_at) * 1000)
+                if mode == 'exact':
+                    # 精确检索 (全表余弦距离) 的结果作为标准答案
+                    truth = set(result)
+                elif truth:
+                    recalls[mode].append(len(truth & set(result)) / len(truth))
+
+        for mode, values in latencies.items():
+            if not values:
+                self.stdout.write(f'{mode:8s} 没有可用的样本')
+                continue
+            values.sort()
+            p50 = statistics.median(values)
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            if mode == 'exact':
+                recall = '1.000'  # 精确检索本身就是标准答案
+            else:
+                # 没有样本 (例如精确检索一个结果都没有) 时不能当成 100% 召回
+                recall = f'{statistics.mean(recalls[mode]):.3f}' if recalls[mode] else 'n/a'
+            self.stdout.write(f'{mode:8s} recall@{k}: {recall}  p50: {p50:.1f} ms  p95: {p95:.1f} ms')
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:20
+
+import django.db.models.deletion
+import pgvector.django.bit
+import pgvector.django.extensions
+import pgvector.django.halfvec
+import pgvector.django.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0005_post_embedded_at'),
+    ]
+
+    operations = [
+        # halfvec / bit 的距离运算和 HNSW 索引需要 pgvector >= 0.7
+        pgvector.django.extensions.VectorExtension(),
+        migrations.CreateModel(
+            name='PostVector',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compact_vector', serialize=False, to='posts.post')),
+                ('embedding_half', pgvector.django.halfvec.HalfVectorField(dimensions=1536)),
+                ('embedding_bits', pgvector.django.bit.BitField(length=1536)),
+            ],
+            options={
+                'indexes': [pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_half'], m=16, name='ai_postvector_half_hnsw', opclasses=['halfvec_cosine_ops']), pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_bits'], m=16, name='ai_postvector_bits_hnsw', opclasses=['bit_hamming_ops'])],
+            },
+        ),
+    ]
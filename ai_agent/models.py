@@ -1,3 +1,95 @@
 from django.db import models
+from django.conf import settings
+from pgvector.django import VectorField, HalfVectorField, BitField, HnswIndex
 
-# Create your models here.
+# 向量维度 (和 Post.embedding 保持一致)
+EMBEDDING_DIMENSIONS = 1536
+
+
+class PostVector(models.Model):
+    """
+    帖子向量的"压缩副本"，只用于 ANN 粗排
+    - embedding_half: 半精度 (每维 2 字节，约 3 KB/行)
+    - embedding_bits: 二值量化 (每维 1 bit，192 字节/行)
+    粗排出候选之后，再用 Post.embedding (全精度) 精确重排
+    """
+    post = models.OneToOneField('posts.Post', on_delete=models.CASCADE, primary_key=True, related_name="compact_vector")
+    embedding_half = HalfVectorField(dimensions=EMBEDDING_DIMENSIONS)
+    embedding_bits = BitField(length=EMBEDDING_DIMENSIONS)
+
+    class Meta:
+        indexes = [
+            HnswIndex(
+                name='ai_postvector_half_hnsw',
+                fields=['embedding_half'],
+                m=16,
+                ef_construction=64,
+                opclasses=['halfvec_cosine_ops'],
+            ),
+            HnswIndex(
+                name='ai_postvector_bits_hnsw',
+                fields=['embedding_bits'],
+                m=16,
+                ef_construction=64,
+                opclasses=['bit_hamming_ops'],
+            ),
+        ]
+
+    def __str__(self):
+        return f"Compact vector of post {self.post_id}"
+
+
+class UserInterest(models.Model):
+    """
+    用户兴趣向量 ("猜你喜欢" 用)
+    是用户点赞 / 评论 / 浏览过的帖子向量的"衰减滑动平均"，每次事件增量更新，不需要回放历史
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="interest")
+    # 已归一化 (长度为 1)，可以直接拿去做余弦相似度检索
+    vector = VectorField(dimensions=EMBEDDING_DIMENSIONS)
+    # 累计参与计算的事件数
+    event_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Interest of user {self.user_id}"
+
+
+class AssistantSession(models.Model):
+    """
+    AI 导购的一次多轮会话 (服务端保存历史，客户端只需要带上 session_id)
+    较早的对话会被压缩进 summary，保证提示词长度不会随对话变长而增长
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="assistant_sessions")
+    # 较早轮次的滚动摘要
+    summary = models.TextField(blank=True, default='')
+    # 已经压缩进 summary 的最后一轮 ID (之后的轮次仍然原样保留)
+    summarized_until_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Assistant session {self.id} of user {self.user_id}"
+
+
+class AssistantTurn(models.Model):
+    """
+    会话中的一轮发言 (用户提问 或 AI 回答)
+    """
+
+    class Role(models.TextChoices):
+        USER = 'user', '用户'
+        ASSISTANT = 'assistant', 'AI'
+
+    session = models.ForeignKey(AssistantSession, on_delete=models.CASCADE, related_name="turns")
+    role = models.CharField(max_length=20, choices=Role.choices)
+    content = models.TextField()
+    # 估算的 token 数 (写入时算好，组装提示词时不用再算)
+    tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_role_display()} turn {self.id} in session {self.session_id}"
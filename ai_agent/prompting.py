@@ -0,0 +1,153 @@
+# backend/ai_agent/prompting.py
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from .models import AssistantTurn
+from .utils import estimate_tokens
+
+# 整个提示词的 token 预算，以及每一部分各自的上限
+# (各部分上限之和不超过总预算，所以对话再长，提示词大小也是固定的)
+PROMPT_TOKEN_BUDGET = 3000
+SECTION_CAPS = {
+    'system': 300,
+    'summary': 400,
+    'history': 1000,
+    'context': 1000,
+    'query': 300,
+}
+
+# 参考商品信息里每个帖子的内容摘要最多占多少 token
+POST_SNIPPET_TOKENS = 150
+
+# 未压缩的历史超过这个量，就在后台把较早的轮次压缩进摘要
+HISTORY_COMPRESS_THRESHOLD = SECTION_CAPS['history']
+# 压缩时保留最近几轮原文不动
+KEEP_RECENT_TURNS = 4
+# 压缩摘要时，每一轮最多取这么多 token (防止压缩请求本身超长)
+SUMMARY_TURN_TOKENS = 300
+# 历史预算不够放下整轮时，至少还剩这么多 token 才截断放入
+MIN_TRUNCATED_TURN_TOKENS = 50
+
+SYSTEM_PROMPT = """你是一个专业的电商导购助手 SocialShop AI。
+你的任务是根据用户的问题，结合下面提供的[参考商品信息]，为用户提供购买建议。
+
+要求：
+1. 语气亲切、专业、有帮助。
+2. 必须基于[参考商品信息]来推荐，不要编造不存在的商品。
+3. 如果参考信息里有合适的，请具体提到商品标题。
+4. 如果参考信息里没有相关的，请礼貌告知用户暂时没找到，并给出一些通用的选购建议。
+"""
+
+SUMMARY_PROMPT = """请把下面的导购对话压缩成一段简短的中文摘要 (不超过 300 字)。
+必须保留：用户的需求、预算、偏好，以及已经推荐过的商品标题。
+
+[已有摘要]:
+{summary}
+
+[新的对话]:
+{dialogue}
+
+摘要：
+"""
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    把文本截断到大约 max_tokens 个 token 以内
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 二分查找能放下的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + '…'
+
+
+def build_context(posts, cap=SECTION_CAPS['context']):
+    """
+    把检索到的帖子拼成[参考商品信息]，超出预算的帖子直接丢弃
+    """
+    blocks = []
+    used = 0
+    for post in posts:
+        # 我们把帖子的标题、内容、价格(如果有)都告诉 AI
+        price = post.product.product_price if hasattr(post, 'product') else "未知"
+        block = (
+            f"--- 商品/帖子 ID: {post.id} ---\n"
+            f"标题: {post.title}\n"
+            f"内容摘要: {truncate_to_tokens(post.content, POST_SNIPPET_TOKENS)}\n"
+            f"价格: {price}\n\n"
+        )
+        tokens = estimate_tokens(block)
+        if used + tokens > cap:
+            break
+        blocks.append(block)
+        used += tokens
+    return ''.join(blocks), used
+
+
+def select_history(turns, cap=SECTION_CAPS['history']):
+    """
+    从最新的一轮往前取，直到用完历史预算
+    返回按时间正序的 (role, content) 列表；放不下的那一轮会被截断
+    """
+    selected = []
+    used = 0
+    for turn in reversed(turns):
+        if used + turn.tokens > cap:
+            remaining = cap - used
+            # 剩余预算太少就不塞半句话进去了
+            if remaining >= MIN_TRUNCATED_TURN_TOKENS:
+                selected.append((turn.role, truncate_to_tokens(turn.content, remaining)))
+                used = cap
+            break
+        selected.append((turn.role, turn.content))
+        used += turn.tokens
+    selected.reverse()
+    return selected, used
+
+
+def build_messages(session, turns, posts, query):
+    """
+    在 token 预算内组装发给大模型的消息
+    返回 (messages, usage)，usage 里是每一部分实际用掉的 token 数
+    """
+    summary = truncate_to_tokens(session.summary, SECTION_CAPS['summary']) if session.summary else ''
+    history, history_tokens = select_history(turns)
+    context_text, context_tokens = build_context(posts)
+    query = truncate_to_tokens(query, SECTION_CAPS['query'])
+
+    system_prompt = SYSTEM_PROMPT
+    if summary:
+        system_prompt += f"\n[之前的对话摘要]:\n{summary}\n"
+
+    messages = [SystemMessage(content=system_prompt)]
+    for role, content in history:
+        if role == AssistantTurn.Role.USER:
+            messages.append(HumanMessage(content=content))
+        else:
+            messages.append(AIMessage(content=content))
+    messages.append(HumanMessage(content=f"[参考商品信息]:\n{context_text}\n[用户问题]:\n{query}\n\n请回答："))
+
+    usage = {
+        'system': estimate_tokens(SYSTEM_PROMPT),
+        'summary': estimate_tokens(summary),
+        'history': history_tokens,
+        'context': context_tokens,
+        'query': estimate_tokens(query),
+    }
+    usage['prompt_tokens'] = sum(usage.values())
+    return messages, usage
+
+
+def build_summary_prompt(summary, turns):
+    dialogue = '\n'.join(
+        f"{'用户' if turn.role == AssistantTurn.Role.USER else 'AI'}: "
+        f"{truncate_to_tokens(turn.content, SUMMARY_TURN_TOKENS)}"
+        for turn in turns
+    )
+    return SUMMARY_PROMPT.format(summary=summary or '(无)', dialogue=dialogue)
@@ -0,0 +1,107 @@
+# backend/ai_agent/search.py
+from django.conf import settings
+from django.db import connection, transaction
+from pgvector import HalfVector
+from pgvector.django import CosineDistance, HammingDistance
+
+from posts.models import Post
+from .models import PostVector
+
+SEARCH_MODES = ('exact', 'halfvec', 'binary')
+
+# pgvector 默认的 hnsw.ef_search (HNSW 索引一次最多只能返回这么多行) 和它允许的上限
+DEFAULT_EF_SEARCH = 40
+MAX_EF_SEARCH = 1000
+
+
+def quantize_binary(vector):
+    """
+    二值量化：每一维大于 0 记为 1，否则记为 0 (返回 bit 字符串)
+    """
+    return ''.join('1' if x > 0 else '0' for x in vector)
+
+
+def compact_vector_fields(vector):
+    """
+    根据全精度向量生成 PostVector 需要的两个压缩字段
+    """
+    vector = [float(x) for x in vector]
+    return {
+        'embedding_half': vector,
+        'embedding_bits': quantize_binary(vector),
+    }
+
+
+def save_post_vector(post_id, vector):
+    """
+    写入 (或更新) 单个帖子的压缩向量
+    """
+    PostVector.objects.update_or_create(post_id=post_id, defaults=compact_vector_fields(vector))
+
+
+def bulk_save_post_vectors(posts):
+    """
+    批量写入压缩向量 (posts 需要已经带有 embedding)
+    已存在的行直接覆盖，一批只需要一条 INSERT ... ON CONFLICT
+    """
+    PostVector.objects.bulk_create(
+        [PostVector(post_id=post.id, **compact_vector_fields(post.embedding)) for post in posts],
+        update_conflicts=True,
+        unique_fields=['post'],
+        update_fields=['embedding_half', 'embedding_bits'],
+    )
+
+
+def similar_post_ids(query_vector, k, queryset=None, mode=None):
+    """
+    返回与 query_vector 最相似的 k 个帖子 ID (按相似度从高到低)
+
+    queryset: 可选的 Post 查询集，用来限定范围 (例如只看某个话题、排除自己)
+    mode:     exact / halfvec / binary，默认读取 settings.AI_VECTOR_SEARCH_MODE
+
+    halfvec / binary 模式下，限定范围的条件是在 HNSW 扫描之后才过滤的：
+    索引最多只返回 ef_search 行，范围越小被过滤掉的越多。所以带 queryset 时把 ef_search
+    调到上限，过滤后的候选仍然不足 k 个就退回精确检索 (这时范围本身很小，精确排序也不慢)
+    """
+    mode = mode or settings.AI_VECTOR_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown vector search mode: {mode}")
+
+    posts = queryset if queryset is not None else Post.objects.all()
+    posts = posts.filter(embedding__isnull=False)
+
+    if mode == 'exact':
+        return list(
+            posts.order_by(CosineDistance('embedding', query_vector)).values_list('id', flat=True)[:k]
+        )
+
+    # 1. 粗排：在压缩副本上走 HNSW 索引，多取几倍候选
+    if mode == 'halfvec':
+        distance = CosineDistance('embedding_half', HalfVector([float(x) for x in query_vector]))
+    else:
+        distance = HammingDistance('embedding_bits', quantize_binary(query_vector))
+
+    candidates = PostVector.objects.all()
+    if queryset is not None:
+        candidates = candidates.filter(post__in=posts.values('id'))
+    num_candidates = k * settings.AI_VECTOR_RERANK_FACTOR
+    # 候选数超过 ef_search 时，索引扫描返回的行数会被截断，需要临时调大；带过滤条件时直接调到上限
+    ef_search = MAX_EF_SEARCH if queryset is not None else min(num_candidates, MAX_EF_SEARCH)
+    with transaction.atomic():
+        if ef_search > DEFAULT_EF_SEARCH:
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL hnsw.ef_search = %s', [ef_search])
+        candidate_ids = list(
+            candidates.order_by(distance).values_list('post_id', flat=True)[:num_candidates]
+        )
+
+    if queryset is not None and len(candidate_ids) < k:
+        # 过滤之后索引扫描几乎没剩下候选 (也可能范围里本来就不足 k 个帖子)，退回精确检索
+        return similar_post_ids(query_vector, k, queryset, mode='exact')
+
+    # 2. 精排：只对候选用全精度向量重新计算余弦距离
+    return list(
+        Post.objects.filter(id__in=candidate_ids)
+        .order_by(CosineDistance('embedding', query_vector))
+        .values_list('id', flat=True)[:k]
+    )
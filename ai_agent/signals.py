@@ -1,8 +1,8 @@
 # backend/ai_agent/signals.py
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from posts.models import Post
-from .tasks import generate_post_embedding
+from posts.models import Post, Vote, Comment
+from .tasks import generate_post_embedding, update_user_interest, EMBEDDING_FIELDS
 from django.db import transaction
 
 
@@ -17,9 +17,27 @@ def trigger_embedding_generation(sender, instance, created, **kwargs):
     update_fields = kwargs.get('update_fields')
 
     # 2. 核心判断：如果是任务自己在更新 embedding，直接退出，打断循环
-    # 我们在 tasks.py 里写的是 post.save(update_fields=['embedding'])
-    if update_fields and 'embedding' in update_fields and len(update_fields) == 1:
+    # 我们在 tasks.py 里写的是 post.save(update_fields=EMBEDDING_FIELDS)
+    if update_fields and set(update_fields) <= set(EMBEDDING_FIELDS):
         return
 
     # 3. 正常触发：如果是创建新帖，或者修改了其他内容
-    transaction.on_commit(lambda: generate_post_embedding.delay(instance.id))
\ No newline at end of file
+    transaction.on_commit(lambda: generate_post_embedding.delay(instance.id))
+
+
+@receiver(post_save, sender=Vote)
+def trigger_interest_on_vote(sender, instance, created, **kwargs):
+    """
+    用户"顶"了帖子 -> 增量更新兴趣向量
+    """
+    if instance.vote_type == Vote.VoteType.UPVOTE:
+        transaction.on_commit(lambda: update_user_interest.delay(instance.user_id, instance.post_id, 'upvote'))
+
+
+@receiver(post_save, sender=Comment)
+def trigger_interest_on_comment(sender, instance, created, **kwargs):
+    """
+    用户评论了帖子 -> 增量更新兴趣向量
+    """
+    if created:
+        transaction.on_commit(lambda: update_user_interest.delay(instance.author_id, instance.post_id, 'comment'))
@@ -1,9 +1,17 @@
 # backend/ai_agent/tasks.py
 from celery import shared_task
-from langchain_community.embeddings import DashScopeEmbeddings
-from posts.models import Post
+from django.utils import timezone
+from posts.models import Post, PostNeighbors
 import os
 from django.conf import settings
+from .utils import get_embeddings, build_embedding_text
+from .search import save_post_vector, similar_post_ids
+
+# 向量任务自己会更新的字段 (signals 里据此判断，避免死循环)
+EMBEDDING_FIELDS = ['embedding', 'embedded_at']
+
+# 每个帖子预计算的相关帖子数量 (同话题 / 跨话题 各取这么多)
+RELATED_POSTS_TOP_K = 10
 
 
 @shared_task
@@ -18,13 +26,11 @@ def generate_post_embedding(post_id):
 
         # 2. 准备要向量化的文本
         # 我们把标题和内容拼接起来，这样搜索时既能搜标题也能搜内容
-        text_to_embed = f"{post.title}\n{post.content}"
+        text_to_embed = build_embedding_text(post)
 
         # 3. 初始化阿里云通义千问 Embedding 模型
         # 它会自动读取环境变量 DASHSCOPE_API_KEY
-        embeddings = DashScopeEmbeddings(
-            model="text-embedding-v1",  # 阿里云推荐的通用文本向量模型
-        )
+        embeddings = get_embeddings()
 
         # 4. 调用 API 生成向量 (这是一个耗时网络请求)
         # 返回的是一个包含 1536 个浮点数的列表
@@ -32,7 +38,13 @@ def generate_post_embedding(post_id):
 
         # 5. 保存回数据库
         post.embedding = vector
-        post.save(update_fields=['embedding'])  # 只更新 embedding 字段，避免覆盖其他并发修改
+        post.embedded_at = timezone.now()
+        post.save(update_fields=EMBEDDING_FIELDS)  # 只更新向量相关字段，避免覆盖其他并发修改
+        # 同步写入压缩副本 (半精度 / 二值)，供 ANN 粗排使用
+        save_post_vector(post.id, vector)
+
+        # 6. 向量写好了，顺手在后台算一下"相关帖子"
+        compute_post_neighbors.delay(post_id)
 
         return f"✅ Success: Generated embedding for Post {post_id}"
 
@@ -40,4 +52,90 @@ def generate_post_embedding(post_id):
         return f"❌ Error: Post {post_id} not found"
     except Exception as e:
         print(f"❌ AI Error: {e}")
-        return f"Error generating embedding: {str(e)}"
\ No newline at end of file
+        return f"Error generating embedding: {str(e)}"
+
+
+@shared_task
+def compute_post_neighbors(post_id, top_k=RELATED_POSTS_TOP_K):
+    """
+    Celery 异步任务：为帖子预计算最相似的帖子 (同话题 + 跨话题)
+    结果写入 PostNeighbors，详情页的 /related/ 接口直接读取
+    """
+    post = Post.objects.filter(id=post_id).only('id', 'topic_id', 'embedding').first()
+    if post is None:
+        return f"❌ Error: Post {post_id} not found"
+    if post.embedding is None:
+        return f"Skip: Post {post_id} has no embedding yet"
+
+    # 只取 ID，按相似度排序 (检索模式见 settings.AI_VECTOR_SEARCH_MODE)
+    others = Post.objects.exclude(id=post.id)
+    same_topic_ids = similar_post_ids(post.embedding, top_k, others.filter(topic_id=post.topic_id))
+    cross_topic_ids = similar_post_ids(post.embedding, top_k, others.exclude(topic_id=post.topic_id))
+
+    PostNeighbors.objects.update_or_create(
+        post_id=post.id,
+        defaults={'same_topic_ids': same_topic_ids, 'cross_topic_ids': cross_topic_ids},
+    )
+    return f"✅ Success: Computed neighbors for Post {post_id}"
+
+
+@shared_task
+def update_user_interest(user_id, post_id, event):
+    """
+    Celery 异步任务：用户 点赞 / 评论 / 浏览 了帖子，增量更新他的兴趣向量
+    """
+    from .interests import apply_interest_event
+
+    if apply_interest_event(user_id, post_id, event):
+        return f"✅ Success: Updated interest of user {user_id} ({event} post {post_id})"
+    return f"Skip: Post {post_id} has no embedding yet"
+
+
+@shared_task
+def compress_assistant_session(session_id):
+    """
+    Celery 异步任务：把 AI 导购会话里较早的轮次压缩进滚动摘要
+    (在后台做，不占用用户的请求时间)
+    """
+    from django.db import transaction
+    from langchain_community.llms import Tongyi
+    from .models import AssistantSession
+    from .prompting import KEEP_RECENT_TURNS, SECTION_CAPS, build_summary_prompt, truncate_to_tokens
+
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return f"❌ Error: Invalid assistant session id {session_id!r}"
+
+    # 1. 不加锁读出要压缩的轮次 (调用大模型要好几秒，期间不能占着会话的行锁，
+    #    否则聊天接口更新 updated_at 时会一直等着)
+    session = AssistantSession.objects.filter(id=session_id).first()
+    if session is None:
+        return f"❌ Error: Assistant session {session_id} not found"
+
+    folded_from = session.summarized_until_id
+    turns = list(session.turns.filter(id__gt=folded_from))
+    to_fold = turns[:-KEEP_RECENT_TURNS]
+    if not to_fold:
+        return f"Skip: Nothing to compress in session {session_id}"
+
+    # 2. 在任何事务之外调用大模型
+    try:
+        summary = Tongyi().invoke(build_summary_prompt(session.summary, to_fold))
+    except Exception as e:
+        print(f"❌ AI Error: {e}")
+        return f"Error compressing session {session_id}: {str(e)}"
+
+    # 3. 短暂加锁写回；如果期间别的任务已经压缩过 (起点变了)，这次的结果作废
+    with transaction.atomic():
+        session = AssistantSession.objects.select_for_update().filter(id=session_id).first()
+        if session is None:
+            return f"❌ Error: Assistant session {session_id} not found"
+        if session.summarized_until_id != folded_from:
+            return f"Skip: Session {session_id} was compressed concurrently"
+
+        session.summary = truncate_to_tokens(str(summary).strip(), SECTION_CAPS['summary'])
+        session.summarized_until_id = to_fold[-1].id
+        session.save(update_fields=['summary', 'summarized_until_id', 'updated_at'])
+
+    return f"✅ Success: Compressed {len(to_fold)} turns of session {session_id}"
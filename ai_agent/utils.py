@@ -0,0 +1,35 @@
+# backend/ai_agent/utils.py
+import re
+
+from langchain_community.embeddings import DashScopeEmbeddings
+
+# 向量模型名 (阿里云推荐的通用文本向量模型, 1536 维)
+EMBEDDING_MODEL = "text-embedding-v1"
+
+# 粗略估算 token 时用到的正则：中日韩字符按 1 字 1 token 计算
+_CJK_RE = re.compile(r'[　-ヿ㐀-䶿一-鿿가-힯＀-￯]')
+
+
+def get_embeddings():
+    """
+    创建 Embedding 客户端 (它会自动读取环境变量 DASHSCOPE_API_KEY)
+    """
+    return DashScopeEmbeddings(model=EMBEDDING_MODEL)
+
+
+def build_embedding_text(post):
+    """
+    把标题和内容拼接起来，这样搜索时既能搜标题也能搜内容
+    """
+    return f"{post.title}\n{post.content}"
+
+
+def estimate_tokens(text):
+    """
+    粗略估算文本的 token 数 (不依赖具体的分词器)
+    中文大约 1 字 1 token，其余字符大约 4 个字符 1 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
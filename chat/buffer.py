@@ -0,0 +1,229 @@
+# backend/chat/buffer.py
+"""
+聊天消息的写后缓冲 (write-behind)
+
+开启 settings.CHAT_WRITE_BEHIND 后：
+1. ChatConsumer 收到消息，先 XADD 到 Redis Stream (持久化，不等数据库)，然后立即广播
+2. python manage.py flush_chat_messages 作为消费组里的 worker 读取 Stream，
+   按 Stream 顺序用 bulk_create 批量写入 chat.Message，写入成功后再 XACK + XDEL
+
+- 顺序：Stream 的 ID 单调递增，worker 按 ID 顺序写入 (自增主键和 Stream 顺序一致)；
+        created_at 直接取自 Stream ID 里的毫秒时间戳，所以按 (created_at, id) 排序就是 Stream 的顺序
+- 幂等：每条消息都有 client_id (唯一索引)，重放时已经写入过的会被跳过；
+        追加到 Stream 之前先在 Redis 里占用 client_id，客户端重发的消息不会被再次广播
+- 恢复：worker 崩溃时已读未确认的消息留在消费组的 pending 列表里，
+        重启后 (消费者名称固定，见 consumer_name) 先重放自己的 pending，
+        再认领其他已经挂掉的 worker 超时未确认的消息
+"""
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .models import Message
+from .utils import record_new_messages
+
+STREAM_KEY = 'chat:messages'
+GROUP_NAME = 'chat-writers'
+# client_id 去重标记的有效期 (秒)：覆盖客户端断线重发的时间窗口，
+# 更晚的重复消息仍然会在落库时被 client_id 唯一索引跳过 (只是会多广播一次)
+CLIENT_ID_TTL = 24 * 60 * 60
+
+
+def _client_id_key(client_id):
+    return f'chat:client_id:{client_id}'
+
+
+def get_redis():
+    return get_redis_connection('default')
+
+
+def parse_client_id(value):
+    """
+    客户端可以自带 client_id (用于重发去重)，不合法或没有就由服务端生成
+    (JSON 帧里是字符串，msgpack 帧里可以是 16 字节)
+    """
+    try:
+        if isinstance(value, bytes):
+            return uuid.UUID(bytes=value)
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return uuid.uuid4()
+
+
+def stream_id_to_datetime(stream_id):
+    """
+    Stream ID 的格式是 "<毫秒时间戳>-<序号>"
+    """
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    milliseconds = int(stream_id.split('-')[0])
+    return datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
+
+
+def consumer_name():
+    """
+    落库 worker 的消费者名称：settings.CHAT_BUFFER_CONSUMER，没有配置就用主机名
+    (不能带进程号，否则重启后就找不到自己之前未确认的消息了)
+    """
+    return settings.CHAT_BUFFER_CONSUMER or socket.gethostname()
+
+
+def append_message(client_id, conversation_id, sender_id, content):
+    """
+    把一条消息追加到 Stream，返回消息的 created_at (由 Stream ID 决定)
+    同一个 client_id 已经追加过 (客户端重发) 就返回 None，调用方不要再广播
+    """
+    redis = get_redis()
+    if not redis.set(_client_id_key(client_id), 1, nx=True, ex=CLIENT_ID_TTL):
+        return None
+    try:
+        stream_id = redis.xadd(STREAM_KEY, {
+            'client_id': str(client_id),
+            'conversation_id': conversation_id,
+            'sender_id': sender_id,
+            'content': content,
+        })
+    except Exception:
+        # 没有追加成功，释放 client_id，让客户端可以重发
+        redis.delete(_client_id_key(client_id))
+        raise
+    return stream_id_to_datetime(stream_id)
+
+
+def ensure_group(redis):
+    """
+    创建消费组 (已存在就忽略)，从 Stream 的最开头开始消费
+    """
+    try:
+        redis.xgroup_create(STREAM_KEY, GROUP_NAME, id='0', mkstream=True)
+    except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _decode(fields):
+    return {
+        (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+        for key, value in fields.items()
+    }
+
+
+def read_pending(redis, consumer, count):
+    """
+    读取本 worker 之前读过但还没确认的消息 (崩溃重启后的重放)
+    """
+    response = redis.xreadgroup(GROUP_NAME, consumer, {STREAM_KEY: '0'}, count=count)
+    return response[0][1] if response else []
+
+
+def claim_stale(redis, consumer, min_idle_ms, count):
+    """
+    认领其他 worker 超过 min_idle_ms 还没确认的消息 (那个 worker 大概率已经挂了)
+    """
+    response = redis.xautoclaim(STREAM_KEY, GROUP_NAME, consumer, min_idle_ms, start_id='0-0', count=count)
+    return [entry for entry in response[1] if entry[1]]
+
+
+def read_new(redis, consumer, count, block_ms):
+    response = redis.xreadgroup(GROUP_NAME, consumer, {STREAM_KEY: '>'}, count=count, block=block_ms)
+    return response[0][1] if response else []
+
+
+def _to_message(entry_id, fields):
+    fields = _decode(fields)
+    return Message(
+        client_id=uuid.UUID(fields['client_id']),
+        conversation_id=int(fields['conversation_id']),
+        sender_id=int(fields['sender_id']),
+        content=fields['content'],
+        created_at=stream_id_to_datetime(entry_id),
+    )
+
+
+def write_entries(entries):
+    """
+    把一批 Stream 消息写入数据库，返回新写入的消息数
+    (调用方在这之后确认这批消息)
+    """
+    rows = [_to_message(entry_id, fields) for entry_id, fields in entries]
+
+    # 幂等：跳过已经写入过的 (上次写入成功但没来得及确认就崩溃了)
+    seen = set(
+        Message.objects.filter(client_id__in=[row.client_id for row in rows]).values_list('client_id', flat=True)
+    )
+    new_rows = []
+    for row in rows:
+        if row.client_id not in seen:
+            seen.add(row.client_id)
+            new_rows.append(row)
+    if not new_rows:
+        return 0
+
+    with transaction.atomic():
+        # 按 Stream 顺序插入，自增 ID 的顺序和 Stream 顺序一致
+        created = Message.objects.bulk_create(new_rows)
+
+        # 每个会话只需要更新一次 (最后一条消息 / updated_at / 未读数)
+        by_conversation = defaultdict(list)
+        for message in created:
+            by_conversation[message.conversation_id].append(message)
+        for conversation_id, messages in by_conversation.items():
+            record_new_messages(conversation_id, messages)
+
+        # bulk_create 不会触发 post_save，手动发出，让私信通知等逻辑照常工作
+        def send_signals():
+            for message in created:
+                post_save.send(sender=Message, instance=message, created=True, update_fields=None, raw=False, using='default')
+        transaction.on_commit(send_signals)
+    return len(created)
+
+
+def acknowledge(redis, entries):
+    ids = [entry_id for entry_id, _ in entries]
+    if not ids:
+        return
+    pipe = redis.pipeline()
+    pipe.xack(STREAM_KEY, GROUP_NAME, *ids)
+    # 已经落库的消息没必要留在 Stream 里
+    pipe.xdel(STREAM_KEY, *ids)
+    pipe.execute()
+
+
+def write_entries_one_by_one(entries):
+    """
+    批量写入失败时逐条写入：跳过重复的 (另一个 worker 刚写过) 和
+    已经无法写入的 (例如会话在消息落库前被删除)，避免一条坏消息卡住整个 Stream
+    """
+    written = 0
+    for entry_id, fields in entries:
+        message = _to_message(entry_id, fields)
+        try:
+            with transaction.atomic():
+                # 逐条 save 会自动触发 post_save
+                message.save()
+                record_new_messages(message.conversation_id, [message])
+        except IntegrityError:
+            continue
+        written += 1
+    return written
+
+
+def flush(redis, entries):
+    """
+    写入并确认一批消息，返回新写入的消息数
+    """
+    if not entries:
+        return 0
+    try:
+        written = write_entries(entries)
+    except IntegrityError:
+        written = write_entries_one_by_one(entries)
+    acknowledge(redis, entries)
+    return written
@@ -1,34 +1,147 @@
 # backend/chat/consumers.py
-import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from . import buffer
 from .models import Conversation, Message
+from .utils import record_new_messages
 from django.contrib.auth import get_user_model
+from core.wire import WireFormatMixin, decode_frame, avatar_url, iso_from_millis, to_millis, uuid_string
+from users.presence import PresenceMixin
 
 User = get_user_model()
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+# 辅助函数: 检查用户是否是会话参与者 (只查中间表，不加载会话和用户)
+@database_sync_to_async
+def is_participant(conversation_id, user_id):
+    return Conversation.participants.through.objects.filter(
+        conversation_id=conversation_id,
+        user_id=user_id
+    ).exists()
+
+
+# 辅助函数: 保存消息到数据库
+# 参与者身份已经在连接 / 订阅时检查过，这里只需要一条 INSERT 和两条按主键/外键的 UPDATE
+# 同一个 client_id 重复发送返回 None；会话已经被删除 (外键约束失败) 时抛出 IntegrityError
+@database_sync_to_async
+def save_message(conversation_id, user, content, client_id, created_at):
+    try:
+        message = Message.objects.create(
+            conversation_id=conversation_id,
+            sender=user,
+            content=content,
+            client_id=client_id,
+            created_at=created_at
+        )
+    except IntegrityError:
+        if Message.objects.filter(client_id=client_id).exists():
+            return None
+        raise
+    # 更新会话的 updated_at (列表排序) / 最后一条消息，以及对方的未读数
+    record_new_messages(conversation_id, [message])
+    return message
+
+
+async def send_chat_message(channel_layer, conversation_id, user, message, client_id=None):
+    """
+    保存 (或写入缓冲) 一条消息并广播给房间组 chat_{conversation_id}
+    成功 (或重复发送) 返回 None，发送失败返回错误说明，由调用方作为 error 帧发回给客户端
+    ChatConsumer 和多路复用连接 (core/consumers.py) 共用
+    """
+    # 消息 ID：客户端可以自带 (断线重发时用来去重)，否则由服务端生成
+    client_id = buffer.parse_client_id(client_id)
+
+    # 消息的数据库 ID (写后缓冲模式下广播时还没有落库，为 None；客户端可以改用 client_id 做游标)
+    message_id = None
+    if settings.CHAT_WRITE_BEHIND:
+        # 1. 写后缓冲：只追加到 Redis Stream，由 flush_chat_messages 批量落库
+        #    (不占用数据库线程，thread_sensitive=False 让它在线程池里并发执行)
+        created_at = await sync_to_async(buffer.append_message, thread_sensitive=False)(
+            client_id, conversation_id, user.id, message
+        )
+        if created_at is None:
+            # 同一个 client_id 重复发送，已经广播过了
+            return
+    else:
+        # 1. 保存消息到数据库 (必须是同步操作转异步)
+        created_at = timezone.now()
+        try:
+            saved = await save_message(conversation_id, user, message, client_id, created_at)
+        except IntegrityError:
+            # 会话在连接 / 订阅之后被删除了 (连接很快会收到 chat_membership_changed 被关闭)
+            return '会话不存在'
+        if not saved:
+            # 同一个 client_id 重复发送，已经处理过了
+            return
+        message_id = saved.id
+
+    # 2. 广播消息给房间组
+    #    (内部事件只带头像的存储路径、毫秒时间戳和 16 字节的 client_id，发给每个连接时再展开)
+    await channel_layer.group_send(
+        f'chat_{conversation_id}',
+        {
+            'type': 'chat_message',
+            'conversation_id': conversation_id,
+            'id': message_id,
+            'message': message,
+            'sender': user.username,
+            'avatar': user.avatar.name or None,
+            'ts': to_millis(created_at),
+            'client_id': client_id.bytes
+        }
+    )
+
+
+def chat_message_payload(event, binary=False):
+    # 发给前端的聊天消息格式 (binary=True 时是 msgpack 帧用的紧凑格式)
+    return {
+        'id': event.get('id'),
+        'message': event['message'],
+        'sender': event['sender'],
+        'avatar': avatar_url(event['avatar']),
+        'created_at': event['ts'] if binary else iso_from_millis(event['ts']),
+        'client_id': event['client_id'] if binary else uuid_string(event['client_id'])
+    }
+
+
+class ChatConsumer(WireFormatMixin, PresenceMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # 1. 获取 URL 中的 room_name (即 conversation_id)
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = f'chat_{self.room_name}'
         self.user = self.scope['user']
+        self.is_member = False
+        # JSON 文本帧 (默认) 或 msgpack 二进制帧 (?format=msgpack)
+        self.negotiate_wire_format()
 
         # 2. 检查用户是否已登录 (Channels 的 AuthMiddlewareStack 会自动填充 scope['user'])
-        if self.user.is_anonymous:
+        if self.user.is_anonymous or not self.room_name.isdigit():
             await self.close()
             return
 
-        # 3. 加入房间组 (Redis Channel Layer)
+        # 3. 只在连接时检查一次是否是会话参与者，之后缓存在连接上
+        #    (参与者变化时会通过 chat_membership_changed 事件通知我们重新检查)
+        self.conversation_id = int(self.room_name)
+        self.is_member = await is_participant(self.conversation_id, self.user.id)
+        if not self.is_member:
+            await self.close()
+            return
+
+        # 4. 加入房间组 (Redis Channel Layer)
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
+        await self.presence_connect()
         await self.accept()
 
     async def disconnect(self, close_code):
+        await self.presence_disconnect()
         # 离开房间组
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -36,52 +149,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
     # 收到 WebSocket 消息 (来自前端)
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-
-        # 1. 保存消息到数据库 (必须是同步操作转异步)
-        saved_message = await self.save_message(self.room_name, self.user, message)
+    async def receive(self, text_data=None, bytes_data=None):
+        if not self.is_member:
+            return
 
-        if saved_message:
-            # 2. 广播消息给房间组
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message': message,
-                    'sender': self.user.username,
-                    'avatar': self.user.avatar.url if self.user.avatar else None,
-                    'created_at': saved_message.created_at.isoformat()
-                }
-            )
+        frame = decode_frame(text_data, bytes_data)
+        error = await send_chat_message(
+            self.channel_layer,
+            self.conversation_id,
+            self.user,
+            frame['message'],
+            frame.get('client_id')
+        )
+        if error:
+            await self.send_payload({'type': 'error', 'detail': error})
 
     # 处理来自房间组的消息 (广播)
     async def chat_message(self, event):
         # 发送给 WebSocket (前端)
-        await self.send(text_data=json.dumps({
-            'message': event['message'],
-            'sender': event['sender'],
-            'avatar': event['avatar'],
-            'created_at': event['created_at']
-        }))
-
-    # 辅助方法: 保存消息到数据库
-    @database_sync_to_async
-    def save_message(self, conversation_id, user, content):
-        try:
-            conversation = Conversation.objects.get(pk=conversation_id)
-            # 只有参与者才能发消息
-            if user not in conversation.participants.all():
-                return None
-
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=user,
-                content=content
+        await self.send_payload(chat_message_payload(event, self.binary_frames))
+
+    # 处理参与者变化 (由 chat/signals.py 广播)
+    async def chat_membership_changed(self, event):
+        # user_ids 为 None 表示参与者被整体清空
+        user_ids = event['user_ids']
+        if user_ids is not None and self.user.id not in user_ids:
+            return
+
+        self.is_member = await is_participant(self.conversation_id, self.user.id)
+        if not self.is_member:
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
             )
-            # 更新会话的 updated_at，以便列表排序
-            conversation.save()
-            return message
-        except Conversation.DoesNotExist:
-            return None
\ No newline at end of file
+            await self.close()
@@ -0,0 +1,88 @@
+# backend/chat/management/commands/bench_chat.py
+import asyncio
+import json
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.middleware import JwtAuthMiddleware
+from chat.models import Conversation, Message
+from chat.routing import websocket_urlpatterns
+from users.models import User
+
+BENCH_USERNAME = 'bench_chat'
+
+
+class Command(BaseCommand):
+    help = '压测聊天 WebSocket：在单个进程 (一个 worker) 内统计每秒能处理多少条消息'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2, help='同一个会话里的并发连接数')
+        parser.add_argument('--messages', type=int, default=500, help='每个连接发送的消息数')
+        parser.add_argument('--keep', action='store_true', help='压测结束后保留生成的消息')
+
+    def handle(self, *args, **options):
+        users = [
+            User.objects.get_or_create(username=f'{BENCH_USERNAME}_{i}')[0]
+            for i in range(options['clients'])
+        ]
+        conversation = Conversation.objects.filter(participants=users[0]).filter(participants=users[-1]).first()
+        if conversation is None:
+            conversation = Conversation.objects.create()
+        conversation.participants.add(*users)
+
+        try:
+            elapsed, latencies = asyncio.run(self.run(conversation.id, users, options['messages']))
+        finally:
+            if not options['keep']:
+                Message.objects.filter(conversation=conversation).delete()
+
+        total = len(latencies)
+        latencies.sort()
+        p95 = latencies[min(total - 1, int(total * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} 个连接 × {options["messages"]} 条 = {total} 条消息  用时 {elapsed:.2f} s  '
+            f'吞吐: {total / elapsed:.0f} 条/秒/worker  '
+            f'p50: {latencies[total // 2]:.1f} ms  p95: {p95:.1f} ms'
+        ))
+
+    async def run(self, conversation_id, users, num_messages):
+        application = JwtAuthMiddleware(URLRouter(websocket_urlpatterns))
+        communicators = []
+        for user in users:
+            token = str(AccessToken.for_user(user))
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{conversation_id}/?token={token}')
+            connected, _ = await communicator.connect()
+            assert connected, f'{user.username} 连接失败'
+            communicators.append(communicator)
+
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*[
+            self.client(communicator, user.username, num_messages)
+            for communicator, user in zip(communicators, users)
+        ])
+        elapsed = time.perf_counter() - started_at
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return elapsed, [latency for latencies in results for latency in latencies]
+
+    async def client(self, communicator, username, num_messages):
+        """
+        逐条发送消息，每条都等到自己的广播回来 (说明已经落库并广播) 再发下一条
+        """
+        latencies = []
+        for i in range(num_messages):
+            content = f'{username} #{i}'
+            sent_at = time.perf_counter()
+            await communicator.send_to(text_data=json.dumps({'message': content}))
+            while True:
+                # 其他连接发的消息也会广播过来，跳过它们
+                frame = json.loads(await communicator.receive_from(timeout=10))
+                if frame['message'] == content:
+                    break
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+        return latencies
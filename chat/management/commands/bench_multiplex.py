@@ -0,0 +1,107 @@
+# backend/chat/management/commands/bench_multiplex.py
+import asyncio
+import json
+import time
+import tracemalloc
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import routing as chat_routing
+from chat.middleware import JwtAuthMiddleware
+from chat.utils import get_or_create_direct_conversation
+from core import routing as core_routing
+from notifications import routing as notifications_routing
+from posts import routing as posts_routing
+from users.models import User
+
+BENCH_USERNAME = 'bench_mux'
+
+
+class Command(BaseCommand):
+    help = '对比 "每个功能一个 WebSocket" 和 "一个多路复用 WebSocket" 的连接数和每个在线用户的内存占用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='模拟的在线用户数')
+        parser.add_argument('--chats', type=int, default=3, help='每个用户同时打开的会话数')
+        parser.add_argument('--posts', type=int, default=1, help='每个用户同时打开的帖子数')
+
+    def handle(self, *args, **options):
+        num_users = options['users']
+        users = [User.objects.get_or_create(username=f'{BENCH_USERNAME}_{i}')[0] for i in range(num_users)]
+        # 每个用户和后面的 chats 个用户各有一个私聊
+        sessions = []
+        for i, user in enumerate(users):
+            conversation_ids = [
+                get_or_create_direct_conversation(user, users[(i + offset) % num_users])[0].id
+                for offset in range(1, options['chats'] + 1)
+            ]
+            post_ids = [i % 100 + offset + 1 for offset in range(options['posts'])]
+            sessions.append((user, str(AccessToken.for_user(user)), conversation_ids, post_ids))
+
+        application = JwtAuthMiddleware(URLRouter(
+            chat_routing.websocket_urlpatterns +
+            notifications_routing.websocket_urlpatterns +
+            posts_routing.websocket_urlpatterns +
+            core_routing.websocket_urlpatterns
+        ))
+        for mode in ('separate', 'multiplex'):
+            self.report(mode, asyncio.run(self.run(application, mode, sessions)), num_users)
+
+    def report(self, mode, result, num_users):
+        connections, memberships, memory, elapsed = result
+        membership_text = f'{memberships} 个组订阅  ' if memberships is not None else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{mode:9s}  {connections} 个连接 ({connections / num_users:.1f}/用户, 每个连接解析一次 JWT)  '
+            f'{membership_text}内存 {memory / num_users / 1024:.1f} KB/用户  建立用时 {elapsed:.2f} s'
+        ))
+
+    async def run(self, application, mode, sessions):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        started_at = time.perf_counter()
+
+        communicators = []
+        for _, token, conversation_ids, post_ids in sessions:
+            if mode == 'separate':
+                paths = (
+                    ['/ws/notifications/'] +
+                    [f'/ws/chat/{conversation_id}/' for conversation_id in conversation_ids] +
+                    [f'/ws/posts/{post_id}/' for post_id in post_ids]
+                )
+                for path in paths:
+                    communicator = WebsocketCommunicator(application, f'{path}?token={token}')
+                    connected, _ = await communicator.connect()
+                    assert connected, path
+                    communicators.append(communicator)
+            else:
+                communicator = WebsocketCommunicator(application, f'/ws/multiplex/?token={token}')
+                connected, _ = await communicator.connect()
+                assert connected
+                topics = (
+                    ['notify'] +
+                    [f'chat:{conversation_id}' for conversation_id in conversation_ids] +
+                    [f'post:{post_id}' for post_id in post_ids]
+                )
+                for topic in topics:
+                    await communicator.send_to(text_data=json.dumps({'action': 'subscribe', 'topic': topic}))
+                    frame = json.loads(await communicator.receive_from())
+                    assert frame['type'] == 'subscribed', frame
+                communicators.append(communicator)
+
+        elapsed = time.perf_counter() - started_at
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        # 注意: 统计的是整个进程新增的内存，包含测试客户端一侧的队列，两种模式的这部分开销相同
+        memory = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+        # 进程内的 channel layer 可以直接数组订阅 (Redis layer 不统计)
+        layer = get_channel_layer()
+        memberships = sum(len(channels) for channels in layer.groups.values()) if hasattr(layer, 'groups') else None
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return len(communicators), memberships, memory, elapsed
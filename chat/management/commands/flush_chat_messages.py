@@ -0,0 +1,60 @@
+# backend/chat/management/commands/flush_chat_messages.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat import buffer
+
+
+class Command(BaseCommand):
+    help = '写后缓冲模式的落库 worker：从 Redis Stream 批量读取聊天消息写入数据库 (可以同时运行多个)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批最多写入多少条消息')
+        parser.add_argument('--block', type=int, default=1000, help='没有新消息时阻塞等待多少毫秒')
+        parser.add_argument('--claim-idle', type=int, default=60000,
+                            help='其他 worker 读取后超过多少毫秒未确认，就认为它已经挂了并接管这些消息')
+        parser.add_argument('--consumer', default=None, help='消费者名称，默认 settings.CHAT_BUFFER_CONSUMER 或主机名 (重启前后要保持一致)')
+        parser.add_argument('--once', action='store_true', help='把当前积压的消息写完就退出')
+
+    def handle(self, *args, **options):
+        redis = buffer.get_redis()
+        buffer.ensure_group(redis)
+        consumer = options['consumer'] or buffer.consumer_name()
+        batch_size = options['batch_size']
+
+        # 1. 先重放自己崩溃前已读未确认的消息
+        replayed = 0
+        while True:
+            entries = buffer.read_pending(redis, consumer, batch_size)
+            if not entries:
+                break
+            replayed += buffer.flush(redis, entries)
+        if replayed:
+            self.stdout.write(f'[{consumer}] 重放 pending: 写入 {replayed} 条')
+
+        total = 0
+        last_claim_at = 0
+        started_at = time.monotonic()
+        while True:
+            # 2. 定期接管挂掉的 worker 留下的消息
+            if time.monotonic() - last_claim_at > options['claim_idle'] / 1000:
+                last_claim_at = time.monotonic()
+                entries = buffer.claim_stale(redis, consumer, options['claim_idle'], batch_size)
+                if entries:
+                    written = buffer.flush(redis, entries)
+                    total += written
+                    self.stdout.write(f'[{consumer}] 接管超时消息 {len(entries)} 条，写入 {written} 条')
+
+            # 3. 读取新消息
+            entries = buffer.read_new(redis, consumer, batch_size, None if options['once'] else options['block'])
+            if not entries:
+                if options['once']:
+                    break
+                continue
+
+            total += buffer.flush(redis, entries)
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(f'[{consumer}] 已写入 {total} 条  ({total / elapsed:.0f} 条/秒)')
+
+        self.stdout.write(self.style.SUCCESS(f'[{consumer}] 完成，共写入 {total + replayed} 条'))
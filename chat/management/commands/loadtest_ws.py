@@ -0,0 +1,242 @@
+# backend/chat/management/commands/loadtest_ws.py
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+import uuid
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Message
+from chat.utils import get_or_create_direct_conversation
+from users.models import User
+from users.presence import get_presence
+
+LOADTEST_USERNAME = 'loadtest_ws'
+
+# --layer memory: 进程内 channel layer + 进程内在线状态，不需要 Redis (聊天消息直接落库)
+MEMORY_SETTINGS = {
+    'CHANNEL_LAYERS': {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': 1000},
+        },
+    },
+    'PRESENCE_BACKEND': 'users.presence.InMemoryPresenceBackend',
+    'CHAT_WRITE_BEHIND': False,
+}
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        '离线压测 WebSocket：在进程内启动 core.asgi.application，模拟大量已登录的客户端 '
+        '(聊天 / 通知 / 帖子三种连接)，统计连接建立速率、广播端到端延迟分位数和每个连接的内存'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1500, help='模拟的连接总数 (三种连接各占三分之一)')
+        parser.add_argument('--layer', choices=['memory', 'redis'], default='memory',
+                            help='memory: 进程内 channel layer；redis: 本地 Redis (--redis-url)')
+        parser.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+                            help='--layer redis 时使用的 Redis 地址')
+        parser.add_argument('--rounds', type=int, default=5, help='广播轮数 (每轮每个会话 / 用户 / 帖子各广播一次)')
+        parser.add_argument('--room-size', type=int, default=10, help='每个帖子房间里的连接数')
+        parser.add_argument('--concurrency', type=int, default=100, help='同时进行的握手数')
+        parser.add_argument('--timeout', type=float, default=30, help='每轮等待广播送达的最长时间 (秒)')
+        parser.add_argument('--skip-memory', action='store_true',
+                            help='不用 tracemalloc 统计内存 (tracemalloc 会让握手明显变慢)')
+        parser.add_argument('--keep', action='store_true', help='压测结束后保留生成的消息')
+
+    def handle(self, *args, **options):
+        per_kind = max(options['clients'] // 3, 2)
+        num_chat = per_kind - per_kind % 2
+        users = self.prepare_users(per_kind)
+        tokens = {user.id: str(AccessToken.for_user(user)) for user in users}
+        # 聊天连接两两一组，各有一个私聊
+        conversation_ids = [
+            get_or_create_direct_conversation(users[i], users[i + 1])[0].id
+            for i in range(0, num_chat, 2)
+        ]
+
+        clients = []
+        for i in range(num_chat):
+            clients.append(('chat', f'/ws/chat/{conversation_ids[i // 2]}/', tokens[users[i].id], conversation_ids[i // 2]))
+        for user in users[:per_kind]:
+            clients.append(('notify', '/ws/notifications/', tokens[user.id], user.id))
+        for i, user in enumerate(users[:per_kind]):
+            post_id = 1 + i // options['room_size']
+            clients.append(('post', f'/ws/posts/{post_id}/', tokens[user.id], post_id))
+
+        if options['layer'] == 'memory':
+            layer_settings = MEMORY_SETTINGS
+        else:
+            layer_settings = {'CHANNEL_LAYERS': {
+                'default': {
+                    'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                    'CONFIG': {'hosts': [options['redis_url']]},
+                },
+            }}
+
+        get_presence.cache_clear()
+        try:
+            with override_settings(**layer_settings):
+                result = asyncio.run(self.run(clients, options))
+        finally:
+            get_presence.cache_clear()
+            if not options['keep']:
+                Message.objects.filter(conversation_id__in=conversation_ids).delete()
+        self.report(options, len(clients), *result)
+
+    def prepare_users(self, count):
+        usernames = [f'{LOADTEST_USERNAME}_{i}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([User(username=username) for username in usernames if username not in existing])
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        return [users[username] for username in usernames]
+
+    async def run(self, clients, options):
+        from core.asgi import application
+
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        setup_latencies = []
+
+        async def open_connection(kind, path, token, target):
+            async with semaphore:
+                started_at = time.perf_counter()
+                communicator = WebsocketCommunicator(application, f'{path}?token={token}')
+                connected, _ = await communicator.connect(timeout=options['timeout'])
+                assert connected, path
+                setup_latencies.append((time.perf_counter() - started_at) * 1000)
+                return communicator
+
+        # 1. 建立连接
+        if not options['skip_memory']:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+        started_at = time.perf_counter()
+        communicators = await asyncio.gather(*[open_connection(*client) for client in clients])
+        setup_elapsed = time.perf_counter() - started_at
+        memory = None
+        if not options['skip_memory']:
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            # 包含测试客户端一侧的队列等开销，是每个连接的上限估计
+            memory = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+        # 2. 广播: 每个连接一个读取任务，按帧里带的标记算出送达延迟
+        sent_at = {}
+        latencies = {'chat': [], 'notify': [], 'post': []}
+        received = asyncio.Event()
+        state = {'expected': 0, 'received': 0}
+
+        async def read_frames(kind, communicator):
+            while True:
+                frame = json.loads(await communicator.receive_from(timeout=3600))
+                if kind == 'chat':
+                    marker = frame['client_id']
+                elif kind == 'notify':
+                    marker = frame.get('loadtest_id')
+                else:
+                    marker = frame['comments'][0].get('loadtest_id')
+                if marker not in sent_at:
+                    continue
+                latencies[kind].append((time.perf_counter() - sent_at[marker]) * 1000)
+                state['received'] += 1
+                if state['received'] >= state['expected']:
+                    received.set()
+
+        readers = [
+            asyncio.create_task(read_frames(kind, communicator))
+            for (kind, *_), communicator in zip(clients, communicators)
+        ]
+        chat_senders = {}
+        for (kind, _, _, target), communicator in zip(clients, communicators):
+            if kind == 'chat':
+                # 每个会话由第一个连接发送，两个参与者 (包括发送者自己) 都会收到
+                chat_senders.setdefault(target, communicator)
+        notify_targets = [target for kind, _, _, target in clients if kind == 'notify']
+        post_rooms = {}
+        for kind, _, _, target in clients:
+            if kind == 'post':
+                post_rooms[target] = post_rooms.get(target, 0) + 1
+
+        layer = get_channel_layer()
+        lost = 0
+        broadcast_started_at = time.perf_counter()
+        for _ in range(options['rounds']):
+            received.clear()
+            state['expected'] += 2 * len(chat_senders) + len(notify_targets) + sum(post_rooms.values())
+            sends = []
+            for communicator in chat_senders.values():
+                marker = str(uuid.uuid4())
+                sent_at[marker] = time.perf_counter()
+                sends.append(communicator.send_to(text_data=json.dumps({'message': 'loadtest', 'client_id': marker})))
+            for user_id in notify_targets:
+                marker = str(uuid.uuid4())
+                sent_at[marker] = time.perf_counter()
+                sends.append(layer.group_send(f'notify_user_{user_id}', {
+                    'type': 'send_notification',
+                    'content': {'type': 'loadtest', 'loadtest_id': marker},
+                }))
+            for post_id in post_rooms:
+                marker = str(uuid.uuid4())
+                sent_at[marker] = time.perf_counter()
+                sends.append(layer.group_send(f'post_{post_id}', {
+                    'type': 'send_new_comments',
+                    'post_id': post_id,
+                    'comments': [{'loadtest_id': marker}],
+                }))
+            await asyncio.gather(*sends)
+            try:
+                await asyncio.wait_for(received.wait(), options['timeout'])
+            except asyncio.TimeoutError:
+                # 没送达的算丢失，下一轮不再等它们
+                lost += state['expected'] - state['received']
+                state['expected'] = state['received']
+        broadcast_elapsed = time.perf_counter() - broadcast_started_at
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+        async def close_connection(communicator):
+            async with semaphore:
+                await communicator.disconnect()
+
+        await asyncio.gather(*[close_connection(communicator) for communicator in communicators])
+        return setup_elapsed, setup_latencies, memory, broadcast_elapsed, latencies, lost
+
+    def report(self, options, connections, setup_elapsed, setup_latencies, memory, broadcast_elapsed, latencies, lost):
+        setup_latencies.sort()
+        memory_text = f'  内存 {memory / connections / 1024:.1f} KB/连接' if memory is not None else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"[{options['layer']}] {connections} 个连接  建立用时 {setup_elapsed:.2f} s  "
+            f'速率 {connections / setup_elapsed:.0f} 个/秒  '
+            f'握手 p50 {percentile(setup_latencies, 0.5):.1f} ms  p95 {percentile(setup_latencies, 0.95):.1f} ms'
+            f'{memory_text}'
+        ))
+        total = 0
+        for kind, values in latencies.items():
+            if not values:
+                continue
+            total += len(values)
+            values.sort()
+            self.stdout.write(
+                f'  {kind:6s}  {len(values):6d} 次送达  p50 {percentile(values, 0.5):.1f} ms  '
+                f'p95 {percentile(values, 0.95):.1f} ms  p99 {percentile(values, 0.99):.1f} ms  '
+                f'max {values[-1]:.1f} ms'
+            )
+        lost_text = f'  丢失 {lost} 次' if lost else ''
+        self.stdout.write(
+            f"  {options['rounds']} 轮广播用时 {broadcast_elapsed:.2f} s  共 {total} 次送达  "
+            f'{total / broadcast_elapsed:.0f} 次/秒{lost_text}'
+        )
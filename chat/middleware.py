@@ -1,29 +1,139 @@
 # backend/chat/middleware.py
+import threading
+import time
+from collections import OrderedDict
+
 from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from jwt import decode as jwt_decode
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs
 
 User = get_user_model()
 
+# 已验证 token -> 用户快照 的进程内缓存
+# 部署后大量客户端同时重连时，命中缓存的握手既不解析 token，也不查数据库、不切线程
+USER_CACHE_TTL = 60
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+class UserSnapshotCache:
+    """
+    token -> (用户快照, 过期时间)
+    过期时间取 TTL 和 token 自身过期时间中较早的那个；用户资料变化时按 user_id 失效
+    (多进程部署时只能失效本进程的缓存，其他进程最多在 TTL 之后更新)
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.tokens_by_user = {}  # user_id -> {token, ...}
+
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self.entries.move_to_end(token)
+            return snapshot
+
+    def set(self, token, snapshot, token_expires_at):
+        expires_at = min(time.time() + self.ttl, token_expires_at)
+        with self.lock:
+            self.entries[token] = (snapshot, expires_at)
+            self.entries.move_to_end(token)
+            self.tokens_by_user.setdefault(snapshot['id'], set()).add(token)
+            # 超出容量时淘汰最久没用过的
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for token in self.tokens_by_user.pop(user_id, ()):
+                self.entries.pop(token, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens_by_user.clear()
+
+    def _remove(self, token):
+        snapshot, _ = self.entries.pop(token)
+        tokens = self.tokens_by_user.get(snapshot['id'])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.tokens_by_user[snapshot['id']]
+
+
+user_cache = UserSnapshotCache()
+
+
+# 快照里只有这几列 (Consumer 只读这些字段)
+SNAPSHOT_FIELDS = ('id', 'username', 'avatar', 'is_active')
+
+
+def _snapshot_is_read_only(*args, **kwargs):
+    raise TypeError('WebSocket 连接上的用户是缓存的只读快照，不能保存或删除；需要写入时请按 id 重新查询')
+
+
+def build_user(snapshot):
+    """
+    用快照构造一个只读的 User 实例：
+    - 和从数据库加载的实例一样 (_state.adding=False)，快照之外的字段都是延迟字段，
+      不会被默认值 (例如 followers_count=0) 冒充
+    - save() / delete() 直接报错，不会用快照覆盖数据库里的真实数据
+    """
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS]
+    user = User.from_db('default', field_names, [snapshot[name] for name in field_names])
+    user.save = user.delete = _snapshot_is_read_only
+    return user
+
 
 @database_sync_to_async
-def get_user(token_key):
+def load_snapshot(user_id):
+    return User.objects.filter(id=user_id).values(*SNAPSHOT_FIELDS).first()
+
+
+async def get_user(token_key):
+    # 1. 命中缓存：直接在事件循环里返回，不解析 token，也不切到线程池
+    snapshot = user_cache.get(token_key)
+    if snapshot is not None:
+        return build_user(snapshot)
+
+    # 2. 验证 Token (签名 + 过期时间)，只解析这一次
     try:
-        # 验证 Token
-        UntypedToken(token_key)
-        # 解码 Token 获取 User ID
-        decoded_data = jwt_decode(token_key, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id = decoded_data['user_id']
-        return User.objects.get(id=user_id)
-    except (InvalidToken, TokenError, User.DoesNotExist):
+        token = UntypedToken(token_key)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return AnonymousUser()
+
+    # 3. 查数据库拿用户快照 (只取需要的几列)
+    snapshot = await load_snapshot(user_id)
+    if snapshot is None or not snapshot['is_active']:
         return AnonymousUser()
 
+    user_cache.set(token_key, snapshot, token['exp'])
+    return build_user(snapshot)
+
+
+# 用户资料变化 (改名 / 换头像 / 被禁用) 或被删除时，丢掉这个用户的缓存
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_cache.invalidate_user(instance.pk)
+
 
 class JwtAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
@@ -39,4 +149,4 @@ class JwtAuthMiddleware(BaseMiddleware):
         # 如果没有 token，scope['user'] 默认为 AnonymousUser (或者由 SessionMiddleware 填充)
         # 但为了优先使用 JWT，我们在这里覆盖它
 
-        return await super().__call__(scope, receive, send)
\ No newline at end of file
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# 已有会话：回填最后一条消息
+BACKFILL_LAST_MESSAGE = """
+UPDATE chat_conversation c
+SET last_message_id = (
+    SELECT m.id FROM chat_message m
+    WHERE m.conversation_id = c.id
+    ORDER BY m.created_at DESC, m.id DESC
+    LIMIT 1
+)
+"""
+
+# 已有参与者：创建已读状态，视为已经读到最后一条 (避免上线后所有旧会话都显示未读)
+BACKFILL_READ_STATES = """
+INSERT INTO chat_conversationreadstate (conversation_id, user_id, last_read_message_id, unread_count, updated_at)
+SELECT p.conversation_id, p.user_id, COALESCE(c.last_message_id, 0), 0, NOW()
+FROM chat_conversation_participants p
+JOIN chat_conversation c ON c.id = p.conversation_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='chat.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL_LAST_MESSAGE, migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_READ_STATES, migrations.RunSQL.noop),
+    ]
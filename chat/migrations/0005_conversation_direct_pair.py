@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:13
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def dedupe_direct_conversations(apps, schema_editor):
+    """
+    给已有的双人会话填上 (user_low, user_high)
+    同一对用户有多个会话时，保留最早的那个，把其余会话的消息合并过去再删除
+    """
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    ConversationReadState = apps.get_model('chat', 'ConversationReadState')
+    Participant = Conversation.participants.through
+
+    two_person = (
+        Participant.objects.values('conversation_id')
+        .annotate(n=Count('user_id'))
+        .filter(n=2)
+        .values('conversation_id')
+    )
+    members = defaultdict(list)
+    for conversation_id, user_id in Participant.objects.filter(
+        conversation_id__in=two_person
+    ).values_list('conversation_id', 'user_id'):
+        members[conversation_id].append(user_id)
+
+    pairs = defaultdict(list)
+    for conversation_id, user_ids in members.items():
+        pairs[tuple(sorted(user_ids))].append(conversation_id)
+
+    for (user_low_id, user_high_id), conversation_ids in pairs.items():
+        keep, *duplicates = sorted(conversation_ids)
+        if duplicates:
+            Message.objects.filter(conversation_id__in=duplicates).update(conversation_id=keep)
+            # 未读数合并到保留的会话上
+            for state in ConversationReadState.objects.filter(conversation_id__in=duplicates):
+                ConversationReadState.objects.filter(conversation_id=keep, user_id=state.user_id).update(
+                    unread_count=F('unread_count') + state.unread_count
+                )
+            Conversation.objects.filter(id__in=duplicates).delete()
+
+            last = Message.objects.filter(conversation_id=keep).order_by('-created_at', '-id').first()
+            if last:
+                Conversation.objects.filter(id=keep).update(last_message=last, updated_at=last.created_at)
+
+        Conversation.objects.filter(id=keep).update(user_low_id=user_low_id, user_high_id=user_high_id)
+
+    # 删除会话产生的外键检查是延迟执行的，先让它们执行完，后面才能在同一个事务里 ALTER TABLE
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_conversation_last_message_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user_high',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_low',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(dedupe_direct_conversations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='chat_conversation_direct_pair'),
+        ),
+    ]
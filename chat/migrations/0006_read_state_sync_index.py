@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_conversation_direct_pair'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversationreadstate',
+            index=models.Index(fields=['user', 'updated_at'], name='chat_read_state_sync_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # backend/chat/models.py
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Conversation(models.Model):
     """
@@ -13,6 +14,35 @@ class Conversation(models.Model):
     )
     # 最后更新时间 (用于排序，把最近聊天的排在前面)
     updated_at = models.DateTimeField(auto_now=True)
+    # 双人私聊的规范化参与者对 (user_low.id < user_high.id)，群聊为空
+    # 有唯一约束，查找 / 创建两个人之间的私聊只需要一次索引查找，也不会并发建出两个
+    user_low = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    user_high = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # 最后一条消息 (冗余存储，会话列表显示预览时不用再逐个会话查消息表)
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='chat_conversation_direct_pair'),
+        ]
 
     def __str__(self):
         return f"Conversation {self.id}"
@@ -32,10 +62,49 @@ class Message(models.Model):
         related_name='sent_messages'
     )
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # 消息的全局唯一 ID (由客户端或服务端在收到消息时生成)
+    # 写后缓冲模式下消息先进 Redis Stream 再批量落库，用它保证重放时不会重复写入
+    client_id = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+    # 不用 auto_now_add：写后缓冲模式下要保留服务端收到消息时的时间，而不是落库时间
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ['created_at', 'id'] # 按时间正序排列 (旧 -> 新)，同一毫秒内按写入顺序
+        indexes = [
+            # 历史消息的游标分页：WHERE conversation_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+            models.Index(fields=['conversation', 'created_at', 'id'], name='chat_message_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message {self.id} by {self.sender}"
+
+
+class ConversationReadState(models.Model):
+    """
+    每个参与者在某个会话里的已读位置和未读数
+    (参与者加入会话时创建，收到新消息时未读数 +1，标记已读时重新计算)
+    """
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='read_states'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_read_states'
+    )
+    # 已读到的最后一条消息 ID (0 表示还没读过)
+    last_read_message_id = models.BigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+    # 未读数 / 已读位置变化的时间 (增量同步 /api/v1/sync/ 据此找出变化的会话)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['created_at'] # 按时间正序排列 (旧 -> 新)
+        unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='chat_read_state_sync_idx'),
+        ]
 
     def __str__(self):
-        return f"Message {self.id} by {self.sender}"
\ No newline at end of file
+        return f"{self.user} 在 {self.conversation} 未读 {self.unread_count}"
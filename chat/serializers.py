@@ -14,15 +14,22 @@ class MessageSerializer(serializers.ModelSerializer):
 
 class ConversationSerializer(serializers.ModelSerializer):
     participants = UserSerializer(many=True, read_only=True)
-    # 获取最后一条消息 (用于在列表页显示预览)
-    last_message = serializers.SerializerMethodField()
+    # 最后一条消息 (用于在列表页显示预览)，直接读会话上冗余的 last_message
+    last_message = MessageSerializer(read_only=True)
+    # 当前用户在这个会话里的未读数
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Conversation
-        fields = ['id', 'participants', 'updated_at', 'last_message']
+        fields = ['id', 'participants', 'updated_at', 'last_message', 'unread_count']
 
-    def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        if last_msg:
-            return MessageSerializer(last_msg).data
-        return None
\ No newline at end of file
+    def get_unread_count(self, obj):
+        # 列表接口已经通过子查询 annotate 好了，不用再逐个查
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count or 0
+
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return 0
+        state = obj.read_states.filter(user=request.user).values_list('unread_count', flat=True).first()
+        return state or 0
@@ -0,0 +1,74 @@
+# backend/chat/signals.py
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from .models import Conversation, ConversationReadState
+
+
+# 辅助函数：通知房间里已经建立的连接重新检查成员身份
+def push_membership_changed(conversation_ids, user_ids):
+    channel_layer = get_channel_layer()
+    for conversation_id in conversation_ids:
+        async_to_sync(channel_layer.group_send)(
+            f"chat_{conversation_id}",
+            {
+                "type": "chat_membership_changed",  # 对应 Consumer 中的方法名
+                "conversation_id": conversation_id,
+                "user_ids": user_ids,  # None 表示整个会话的参与者都被清空
+            }
+        )
+
+
+# 监听会话参与者的变化 (维护已读状态，并通知已建立的连接)
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # 从用户一侧清空 (user.conversations.clear())，post_clear 时就查不到是哪些会话了，先记下来
+        instance._cleared_conversation_ids = list(instance.conversations.values_list('id', flat=True))
+        return
+
+    if action == 'post_add':
+        # 新参与者：创建已读状态 (未读数从 0 开始)
+        if reverse:
+            pairs = [(conversation_id, instance.pk) for conversation_id in pk_set]
+        else:
+            pairs = [(instance.pk, user_id) for user_id in pk_set]
+        ConversationReadState.objects.bulk_create(
+            [ConversationReadState(conversation_id=c, user_id=u) for c, u in pairs],
+            ignore_conflicts=True
+        )
+        # 新增参与者不影响已有连接 (新成员自己连接时会检查)
+        return
+
+    if action not in ('post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # instance 是用户，pk_set 是会话 ID
+        if action == 'post_clear':
+            conversation_ids = instance.__dict__.pop('_cleared_conversation_ids', [])
+        else:
+            conversation_ids = list(pk_set)
+        user_ids = [instance.pk]
+    else:
+        conversation_ids = [instance.pk]
+        user_ids = list(pk_set) if action == 'post_remove' else None
+
+    # 离开会话的人不再累计未读
+    read_states = ConversationReadState.objects.filter(conversation_id__in=conversation_ids)
+    if user_ids is not None:
+        read_states = read_states.filter(user_id__in=user_ids)
+    read_states.delete()
+
+    # 连接收到事件后会回查数据库，所以要等事务提交后再推送
+    transaction.on_commit(lambda: push_membership_changed(conversation_ids, user_ids))
+
+
+# 删除会话时中间表是级联删除的，不会触发 m2m_changed：同样通知已建立的连接重新检查
+# (否则连接上缓存的成员身份一直有效，发消息时才因为外键失败)
+@receiver(post_delete, sender=Conversation)
+def conversation_deleted(sender, instance, **kwargs):
+    conversation_id = instance.pk
+    transaction.on_commit(lambda: push_membership_changed([conversation_id], None))
@@ -0,0 +1,48 @@
+# backend/chat/utils.py
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Conversation, ConversationReadState
+
+
+def record_new_messages(conversation_id, messages):
+    """
+    消息写入数据库之后调用：更新会话的最后一条消息 / updated_at，并给其他参与者的未读数加上新消息数
+    messages 是同一个会话里刚写入的消息，按时间正序
+    """
+    last = messages[-1]
+    # 写后缓冲模式下几批消息可能乱序到达，只在这批更新时才覆盖
+    Conversation.objects.filter(pk=conversation_id).filter(
+        Q(last_message__isnull=True) | Q(updated_at__lte=last.created_at)
+    ).update(updated_at=last.created_at, last_message=last)
+
+    # 自己发的消息不算自己的未读；一批里有几个发送者就按发送者分别累加
+    # (update 不会自动刷新 auto_now，手动带上 updated_at，增量同步靠它)
+    now = timezone.now()
+    for sender_id, count in Counter(message.sender_id for message in messages).items():
+        ConversationReadState.objects.filter(conversation_id=conversation_id).exclude(
+            user_id=sender_id
+        ).update(unread_count=F('unread_count') + count, updated_at=now)
+
+
+def get_or_create_direct_conversation(user, other):
+    """
+    获取 (或创建) 两个人之间的私聊，返回 (conversation, created)
+    通过 (user_low, user_high) 唯一约束保证并发时也只会有一个
+    """
+    user_low, user_high = sorted([user, other], key=lambda u: u.id)
+    conversation = Conversation.objects.filter(user_low=user_low, user_high=user_high).first()
+    if conversation:
+        return conversation, False
+
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(user_low=user_low, user_high=user_high)
+            conversation.participants.add(user_low, user_high)
+    except IntegrityError:
+        # 另一个请求抢先建好了
+        return Conversation.objects.get(user_low=user_low, user_high=user_high), False
+    return conversation, True
@@ -2,14 +2,41 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count
+import uuid
+
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from .models import Conversation, Message
+from .models import Conversation, ConversationReadState, Message
 from .serializers import ConversationSerializer, MessageSerializer
+from .utils import get_or_create_direct_conversation
 
 User = get_user_model()
 
+# 历史消息每页默认条数 / 最大条数
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
+
+def conversation_list_queryset(user):
+    """
+    用户参与的会话，按更新时间倒序
+    最后一条消息 (含发送者) 用 JOIN 带出，参与者一次性预取，未读数用子查询，
+    所以不管有多少个会话，列表都是固定的 2 条查询 (增量同步 /api/v1/sync/ 也用它)
+    """
+    unread_count = ConversationReadState.objects.filter(
+        conversation=OuterRef('pk'), user=user
+    ).values('unread_count')[:1]
+    return (
+        user.conversations
+        .select_related('last_message__sender')
+        .prefetch_related('participants')
+        .annotate(unread_count=Subquery(unread_count))
+        .order_by('-updated_at')
+    )
+
 
 class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -19,23 +46,101 @@ class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ConversationSerializer
 
     def get_queryset(self):
-        # 只返回当前用户参与的会话，按更新时间倒序
-        return self.request.user.conversations.all().order_by('-updated_at')
+        # 只返回当前用户参与的会话
+        return conversation_list_queryset(self.request.user)
 
-    # 动作: 获取某个会话的历史消息
-    # URL: /api/v1/chat/conversations/{id}/messages/
+    # 动作: 获取某个会话的历史消息 (游标分页，先返回最新的)
+    # URL: /api/v1/chat/conversations/{id}/messages/?limit=50
+    #      往前翻页: ?before=<当前最早一条消息的 id>
+    #      断线重连补齐: ?after=<收到的最后一条消息的 id>
+    #      游标也可以是消息的 client_id (实时推送的帧里一定有 client_id；写后缓冲模式下没有 id)
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         conversation = self.get_object()
-        # 分页获取消息
-        messages = conversation.messages.all().order_by('created_at')
-        page = self.paginate_queryset(messages)
-        if page is not None:
-            serializer = MessageSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        try:
+            limit = min(max(int(request.query_params.get('limit', MESSAGES_PAGE_SIZE)), 1), MESSAGES_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = MESSAGES_PAGE_SIZE
+
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response({'detail': 'before 和 after 不能同时使用'}, status=status.HTTP_400_BAD_REQUEST)
+
+        messages = conversation.messages.select_related('sender')
+        cursor_id = before or after
+        if cursor_id:
+            # 游标是消息 ID 或 client_id，按 (created_at, id) 定位
+            cursor = None
+            if cursor_id.isdigit():
+                cursor = conversation.messages.filter(id=cursor_id).values('created_at', 'id').first()
+            else:
+                try:
+                    client_id = uuid.UUID(cursor_id)
+                except ValueError:
+                    client_id = None
+                if client_id:
+                    cursor = conversation.messages.filter(client_id=client_id).values('created_at', 'id').first()
+            if cursor is None:
+                # 写后缓冲模式下刚发的消息可能还没落库，稍后重试即可
+                return Response({'detail': '无效的游标'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # 按 (created_at, id) 排在游标之前 / 之后，走 chat_message_history_idx 索引
+            created_at, message_id = cursor['created_at'], cursor['id']
+            if before:
+                messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+            else:
+                messages = messages.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id))
+
+        # 多取一条，用来判断还有没有下一页
+        if after:
+            page = list(messages.order_by('created_at', 'id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            # 没有游标 / before：从新往旧取，再翻转成正序 (旧 -> 新)
+            page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+
+        serializer = MessageSerializer(page, many=True)
+        return Response({
+            'results': serializer.data,
+            # before 方向表示更早的消息还有没有，after 方向表示更新的消息还有没有
+            'has_more': has_more,
+        })
+
+    # 动作: 把会话标记为已读 (读到 message_id 为止，不传就是读到最后一条)
+    # URL: /api/v1/chat/conversations/{id}/read/
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        conversation = self.get_object()
+        message_id = request.data.get('message_id', conversation.last_message_id)
+        try:
+            message_id = int(message_id or 0)
+        except (TypeError, ValueError):
+            return Response({'detail': 'message_id 不合法'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if message_id and not conversation.messages.filter(id=message_id).exists():
+            return Response({'detail': '消息不存在'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # 已读位置只前进不后退；未读数 = 之后别人发的消息数 (一条 UPDATE 里用子查询算好)
+        remaining = Message.objects.filter(
+            conversation=conversation, id__gt=message_id
+        ).exclude(sender=request.user).values('conversation').annotate(n=Count('id')).values('n')
+        ConversationReadState.objects.filter(
+            conversation=conversation, user=request.user, last_read_message_id__lt=message_id
+        ).update(
+            last_read_message_id=message_id,
+            unread_count=Coalesce(Subquery(remaining), 0),
+            updated_at=timezone.now()
+        )
+
+        state = ConversationReadState.objects.filter(conversation=conversation, user=request.user).first()
+        return Response({
+            'last_read_message_id': state.last_read_message_id if state else message_id,
+            'unread_count': state.unread_count if state else 0,
+        })
 
     # 动作: 开始一个新会话 (或获取已有会话)
     # URL: /api/v1/chat/conversations/start/?username=Mike
@@ -53,16 +158,8 @@ class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
         if target_user == request.user:
             return Response({'detail': '不能和自己聊天'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 查找是否已经存在这两个人的私聊
-        # 这是一个比较复杂的查询: 找到一个 conversation，它的 participants 刚好包含这两个人
-        # 这里为了简化 MVP，我们查找 "包含我且包含他" 的会话
-        # (严谨的逻辑应该确保只有这两个人，但在 MVP 中我们假设只做私聊)
-        me = request.user
-        conversation = Conversation.objects.filter(participants=me).filter(participants=target_user).first()
-
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(me, target_user)
+        # 查找是否已经存在这两个人的私聊 (按规范化的参与者对走唯一索引，没有就创建)
+        conversation, _ = get_or_create_direct_conversation(request.user, target_user)
 
         serializer = self.get_serializer(conversation)
         return Response(serializer.data)
\ No newline at end of file
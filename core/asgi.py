@@ -17,6 +17,7 @@ from chat.middleware import JwtAuthMiddleware
 from chat import routing as chat_routing
 from notifications import routing as notifications_routing
 from posts import routing as posts_routing
+from core import routing as core_routing
 
 
 application = ProtocolTypeRouter({
@@ -30,7 +31,8 @@ application = ProtocolTypeRouter({
             # 合并路由列表
             chat_routing.websocket_urlpatterns +
             notifications_routing.websocket_urlpatterns +
-            posts_routing.websocket_urlpatterns
+            posts_routing.websocket_urlpatterns +
+            core_routing.websocket_urlpatterns
         )
     ),
 })
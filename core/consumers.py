@@ -0,0 +1,177 @@
+# backend/core/consumers.py
+import msgpack
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.contrib.auth.models import AnonymousUser
+from chat.consumers import chat_message_payload, is_participant, send_chat_message
+from core.wire import WireFormatMixin, decode_frame
+from posts.live import feed_room_name
+from users.presence import PresenceMixin, RoomOccupancyMixin
+
+# 一个连接最多同时订阅多少个主题
+MAX_TOPICS = 100
+
+
+class MultiplexConsumer(WireFormatMixin, PresenceMixin, RoomOccupancyMixin, AsyncWebsocketConsumer):
+    """
+    多路复用连接: 一个客户端只开一个 WebSocket，通过订阅帧收发多个主题
+    (JWT 只在建立连接时解析一次，在线状态也只登记一次)
+
+    客户端 -> 服务端:
+        {"action": "subscribe",   "topic": "chat:12"}
+        {"action": "unsubscribe", "topic": "post:5"}
+        {"action": "send",        "topic": "chat:12", "message": "你好", "client_id": "..."}
+    服务端 -> 客户端 (每一帧都带 topic):
+        {"topic": "chat:12", "type": "chat_message", ...}
+        {"topic": "notify",  "type": "new_notification", ...}
+        {"topic": "post:5",  "type": "new_comments", "comments": [{...}, ...]}
+        {"topic": "post:5",  "type": "post_stats", "score": 10, "comments_count": 3}
+        {"topic": "feed:5",  "type": "post_stats", "score": 10, "comments_count": 3}
+        {"topic": "...", "type": "subscribed" / "unsubscribed" / "error", ...}
+    连接 URL 加 ?format=msgpack 时收发的都是 msgpack 二进制帧 (见 core/wire.py)
+
+    主题:
+        notify      当前用户的通知 (需要登录)
+        chat:<id>   会话消息 (需要是参与者)
+        post:<id>   帖子的新评论和分数 / 评论数 (匿名也可以订阅)
+        feed:<id>   信息流卡片：只有分数 / 评论数 (匿名也可以订阅)
+    """
+
+    async def connect(self):
+        # 没带 token 时 JwtAuthMiddleware 不会设置 user，按匿名处理 (只能订阅帖子)
+        self.user = self.scope.get('user') or AnonymousUser()
+        # topic -> 对应的 channel layer 组名
+        self.topics = {}
+        self.negotiate_wire_format()
+        if self.user.is_authenticated:
+            await self.presence_connect()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.presence_disconnect()
+        await self.room_exit_all()
+        for group_name in self.topics.values():
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+        self.topics = {}
+
+    async def send_frame(self, topic, frame_type, **payload):
+        await self.send_payload({'topic': topic, 'type': frame_type, **payload})
+
+    # 收到 WebSocket 消息 (来自前端)
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            frame = decode_frame(text_data, bytes_data)
+            action = frame['action']
+            topic = frame['topic']
+        except (ValueError, KeyError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+            topic = None
+        if not isinstance(topic, str):
+            await self.send_frame(None, 'error', detail='帧格式错误')
+            return
+
+        if action == 'subscribe':
+            await self.subscribe(topic)
+        elif action == 'unsubscribe':
+            await self.unsubscribe(topic)
+            await self.send_frame(topic, 'unsubscribed')
+        elif action == 'send':
+            await self.send_to_topic(topic, frame)
+        else:
+            await self.send_frame(topic, 'error', detail=f'未知的 action: {action}')
+
+    async def resolve_group(self, topic):
+        """
+        检查能否订阅这个主题，返回 (组名, 错误信息)
+        """
+        kind, _, object_id = topic.partition(':')
+        if kind == 'post' and object_id.isdigit():
+            return f'post_{object_id}', None
+        if kind == 'feed' and object_id.isdigit():
+            return feed_room_name(object_id), None
+
+        if self.user.is_anonymous:
+            return None, '需要登录'
+        if topic == 'notify':
+            return f'notify_user_{self.user.id}', None
+        if kind == 'chat' and object_id.isdigit():
+            # 只在订阅时检查一次参与者身份 (参与者变化时会收到 chat_membership_changed)
+            if not await is_participant(int(object_id), self.user.id):
+                return None, '不是会话参与者'
+            return f'chat_{object_id}', None
+        return None, '未知的主题'
+
+    async def subscribe(self, topic):
+        if topic in self.topics:
+            await self.send_frame(topic, 'subscribed')
+            return
+        if len(self.topics) >= MAX_TOPICS:
+            await self.send_frame(topic, 'error', detail=f'最多同时订阅 {MAX_TOPICS} 个主题')
+            return
+
+        group_name, error = await self.resolve_group(topic)
+        if error:
+            await self.send_frame(topic, 'error', detail=error)
+            return
+
+        await self.channel_layer.group_add(group_name, self.channel_name)
+        self.topics[topic] = group_name
+        if topic.startswith(('post:', 'feed:')):
+            # 帖子房间登记占用 (没人在看的帖子不广播新评论和分数)
+            await self.room_enter(group_name)
+        await self.send_frame(topic, 'subscribed')
+
+    async def unsubscribe(self, topic):
+        group_name = self.topics.pop(topic, None)
+        if group_name:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+            await self.room_exit(group_name)
+
+    async def send_to_topic(self, topic, frame):
+        # 目前只有聊天主题支持发送，且必须先订阅 (订阅时已经检查过参与者身份)
+        if not topic.startswith('chat:') or topic not in self.topics:
+            await self.send_frame(topic, 'error', detail='请先订阅这个会话')
+            return
+        if 'message' not in frame:
+            await self.send_frame(topic, 'error', detail='缺少 message')
+            return
+        error = await send_chat_message(
+            self.channel_layer,
+            int(topic.split(':')[1]),
+            self.user,
+            frame['message'],
+            frame.get('client_id')
+        )
+        if error:
+            await self.send_frame(topic, 'error', detail=error)
+
+    # ----- 以下处理来自各个组的事件，方法名和原来的单用途 Consumer 一致 -----
+
+    async def chat_message(self, event):
+        await self.send_frame(
+            f"chat:{event['conversation_id']}", 'chat_message', **chat_message_payload(event, self.binary_frames)
+        )
+
+    async def chat_membership_changed(self, event):
+        user_ids = event['user_ids']
+        if user_ids is not None and self.user.id not in user_ids:
+            return
+        topic = f"chat:{event['conversation_id']}"
+        if not await is_participant(event['conversation_id'], self.user.id):
+            # 被移出会话: 只取消这个主题的订阅，连接本身保留
+            await self.unsubscribe(topic)
+            await self.send_frame(topic, 'unsubscribed', reason='removed')
+
+    async def send_notification(self, event):
+        await self.send_payload({'topic': 'notify', **event['content']})
+
+    async def send_new_comments(self, event):
+        await self.send_frame(f"post:{event['post_id']}", 'new_comments', comments=event['comments'])
+
+    async def send_post_stats(self, event):
+        await self.send_frame(
+            f"post:{event['post_id']}", 'post_stats', score=event['score'], comments_count=event['comments_count']
+        )
+
+    async def send_feed_post_stats(self, event):
+        await self.send_frame(
+            f"feed:{event['post_id']}", 'post_stats', score=event['score'], comments_count=event['comments_count']
+        )
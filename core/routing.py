@@ -0,0 +1,8 @@
+# backend/core/routing.py
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    # ws://localhost:8000/ws/multiplex/ (一个连接订阅多个主题，见 MultiplexConsumer)
+    re_path(r'ws/multiplex/$', consumers.MultiplexConsumer.as_asgi()),
+]
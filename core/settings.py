@@ -199,6 +199,35 @@ CORS_ALLOWED_ORIGINS = [
 CELERY_BROKER_URL = os.environ.get('REDIS_URL')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL')
 
+# 定时任务 (需要同时运行 celery -A core beat)
+# deliver_notifications: 把通知发件箱里的记录批量落库并推送，间隔 (秒) 可以用环境变量调整
+CELERY_BEAT_SCHEDULE = {
+    'deliver-notifications': {
+        'task': 'notifications.tasks.deliver_notifications',
+        'schedule': float(os.environ.get('NOTIFICATION_DELIVERY_INTERVAL', '2')),
+    },
+    # 校正通知未读数计数器 (每 10 分钟)
+    'reconcile-unread-counts': {
+        'task': 'notifications.tasks.reconcile_unread_counts',
+        'schedule': 600.0,
+    },
+    # 归档已读的旧通知 (每小时，每次分批处理有上限)
+    'archive-notifications': {
+        'task': 'notifications.tasks.archive_notifications',
+        'schedule': 3600.0,
+    },
+    # 按实际数据校正话题的订阅数 / 帖子数 / 热度 (每小时)
+    'reconcile-topic-stats': {
+        'task': 'topics.tasks.reconcile_topic_stats',
+        'schedule': 3600.0,
+    },
+    # 校正用户的粉丝数 / 关注数 (每天；删除用户时级联删掉的关注靠它修正)
+    'rebuild-follow-counts': {
+        'task': 'users.tasks.rebuild_follow_counts',
+        'schedule': 86400.0,
+    },
+}
+
 # 缓存
 CACHES = {
     "default": {
@@ -273,3 +302,24 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# 向量检索模式
+# exact:   直接在 Post.embedding (float32) 上精确排序 (默认)
+# halfvec: 先在半精度副本上做 ANN 粗排，再用全精度向量精确重排
+# binary:  先在二值量化副本上做 ANN 粗排，再用全精度向量精确重排
+# (halfvec / binary 需要先运行 python manage.py convert_embeddings)
+AI_VECTOR_SEARCH_MODE = os.environ.get('AI_VECTOR_SEARCH_MODE', 'exact')
+# 粗排候选数 = 最终需要的数量 * 这个倍数
+AI_VECTOR_RERANK_FACTOR = int(os.environ.get('AI_VECTOR_RERANK_FACTOR', '4'))
+
+# 聊天写后缓冲 (write-behind)
+# 开启后消息先写入 Redis Stream 并立即广播，
+# 再由 python manage.py flush_chat_messages 批量写入数据库
+CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'False') == 'True'
+# 落库 worker 在消费组里的名称，重启前后必须相同才能重放自己未确认的消息
+# 默认是主机名 (每个 pod / 服务一个 worker)；同一台机器上跑多个 worker 时给每个固定一个不同的名称
+CHAT_BUFFER_CONSUMER = os.environ.get('CHAT_BUFFER_CONSUMER', '')
+
+# 在线状态后端 (见 users/presence.py)
+# 测试 / 单进程开发时可以换成 users.presence.InMemoryPresenceBackend
+PRESENCE_BACKEND = os.environ.get('PRESENCE_BACKEND', 'users.presence.RedisPresenceBackend')
@@ -28,6 +28,7 @@ from posts.views import PostViewSet
 from users.views import ProfileViewSet, MerchantViewSet
 from chat.views import ConversationViewSet
 from notifications.views import NotificationViewSet
+from core.views import SyncView
 
 
 # 1. 创建一个 V1 版本的总路由器
@@ -50,6 +51,9 @@ urlpatterns = [
     # 把所有 /api/v1/ 开头的 URL 都交给我们的总路由器处理
     path('api/v1/', include(router_v1.urls)),
 
+    # 增量同步 (通知 / 会话 / 未读状态)
+    path('api/v1/sync/', SyncView.as_view(), name='sync'),
+
     # 我们的认证 API (Login, Register, etc.)
     # Djoser 会自动生成 /auth/token, /auth/users, /auth/users/me 等
     path('api/v1/auth/', include('users.urls')),  # <-- 这是修正后的一行
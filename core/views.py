@@ -0,0 +1,70 @@
+# backend/core/views.py
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from chat.serializers import ConversationSerializer
+from chat.views import conversation_list_queryset
+from core.wire import from_millis, to_millis
+from notifications.serializers import NotificationSerializer
+from notifications.utils import get_unread_count
+
+# 同步令牌最多能有多旧，再旧就让客户端全量刷新
+SYNC_MAX_AGE = timedelta(days=7)
+# 一次增量最多返回多少条，变化太多时也让客户端全量刷新
+SYNC_MAX_CHANGES = 500
+# 新令牌往回留一点重叠：时间戳已经写好、但事务还没提交的变化不会被漏掉 (客户端按 id 覆盖，重复无害)
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class SyncView(APIView):
+    """
+    增量同步 (App 从后台回到前台时用，代替重新拉取通知列表和会话列表)
+    URL: /api/v1/sync/?since=<上次返回的 token>
+
+    返回 since 之后有变化的通知 (新通知 / 已读 / 聚合更新) 和会话 (新消息 / 未读数 / 已读位置)，
+    以及当前的通知未读数和会话 ID 全集 (客户端据此删掉已经退出的会话)
+    没有 since、since 不合法或太旧、变化太多时返回 full_resync=true，客户端改为全量拉取
+    不管哪种情况都返回新的 token，下次带上
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        now = timezone.now()
+        token = str(to_millis(now - SYNC_OVERLAP))
+
+        since = request.query_params.get('since', '')
+        if not since.isdigit():
+            return Response({'token': token, 'full_resync': True})
+        since = from_millis(int(since))
+        if since < now - SYNC_MAX_AGE:
+            return Response({'token': token, 'full_resync': True})
+
+        user = request.user
+        notifications = list(
+            user.notifications
+            .filter(updated_at__gte=since)
+            .select_related('actor')
+            .order_by('-updated_at')[:SYNC_MAX_CHANGES + 1]
+        )
+        conversations = list(
+            conversation_list_queryset(user).filter(
+                Q(updated_at__gte=since) |
+                Q(read_states__user=user, read_states__updated_at__gte=since)
+            ).distinct()[:SYNC_MAX_CHANGES + 1]
+        )
+        if len(notifications) > SYNC_MAX_CHANGES or len(conversations) > SYNC_MAX_CHANGES:
+            return Response({'token': token, 'full_resync': True})
+
+        return Response({
+            'token': token,
+            'full_resync': False,
+            'notifications': NotificationSerializer(notifications, many=True).data,
+            'unread_count': get_unread_count(user.id),
+            'conversations': ConversationSerializer(conversations, many=True, context={'request': request}).data,
+            'conversation_ids': list(user.conversations.values_list('id', flat=True)),
+        })
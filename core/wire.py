@@ -0,0 +1,139 @@
+# backend/core/wire.py
+"""
+WebSocket 帧格式
+
+默认是 JSON 文本帧 (和以前完全一样)。客户端可以在连接 URL 上加 ?format=msgpack
+选择二进制帧：
+- 服务端 -> 客户端：msgpack 编码，字段名换成 COMPACT_KEYS 里的短名字 (嵌套的字典也一样)，
+  时间是毫秒时间戳 (整数)，聊天消息的 client_id 是 16 字节的 UUID
+- 客户端 -> 服务端：msgpack 编码的字典，字段名和 JSON 帧相同 (上行流量小，不做压缩)
+
+组内广播的内部事件也尽量精简：只带头像的存储路径和毫秒时间戳，
+完整的头像 URL / ISO 时间在最后发给每个连接时才生成 (头像 URL 有进程内缓存)
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+import msgpack
+from django.core.files.storage import default_storage
+
+FORMAT_JSON = 'json'
+FORMAT_MSGPACK = 'msgpack'
+
+# 下行帧的字段名压缩表 (客户端解码时反查)
+COMPACT_KEYS = {
+    'topic': 'tp',
+    'type': 't',
+    'conversation_id': 'cv',
+    'message': 'm',
+    'sender': 's',
+    'avatar': 'a',
+    'created_at': 'ts',
+    'client_id': 'ci',
+    'comment': 'c',
+    'comments': 'cs',
+    'score': 'sc',
+    'comments_count': 'cc',
+    'content': 'ct',
+    'author': 'au',
+    'username': 'u',
+    'replies': 'rp',
+    'notification_type': 'nt',
+    'actor_name': 'an',
+    'actor_count': 'ac',
+    'unread_count': 'uc',
+    'detail': 'd',
+    'reason': 'r',
+}
+
+
+def negotiate_format(scope):
+    query_params = parse_qs(scope.get('query_string', b'').decode())
+    return FORMAT_MSGPACK if query_params.get('format', [None])[0] == FORMAT_MSGPACK else FORMAT_JSON
+
+
+def compact(value):
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(key, key): compact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def to_millis(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def from_millis(millis):
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+
+
+# 同一条广播在一个进程里会被组内的每个连接各展开一次，展开结果缓存起来
+@lru_cache(maxsize=1024)
+def iso_from_millis(millis):
+    return from_millis(millis).isoformat()
+
+
+@lru_cache(maxsize=1024)
+def uuid_string(value):
+    return str(uuid.UUID(bytes=value))
+
+
+# 头像 URL 的进程内缓存：OSS 返回的是带签名的 URL (URL_EXPIRE_SECONDS = 3600 秒后失效)，
+# 缓存时间必须明显短于签名有效期，否则会一直发出已经过期的链接
+AVATAR_URL_TTL = 50 * 60
+AVATAR_URL_CACHE_SIZE = 10000
+_avatar_urls = {}  # 存储路径 -> (URL, 过期时间戳)
+
+
+def avatar_url(name):
+    """
+    头像存储路径 -> URL (同一个头像在每次广播里都要用到，缓存 AVATAR_URL_TTL 秒)
+    """
+    if not name:
+        return None
+    now = time.monotonic()
+    cached = _avatar_urls.get(name)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    if len(_avatar_urls) >= AVATAR_URL_CACHE_SIZE:
+        _avatar_urls.clear()
+    url = default_storage.url(name)
+    _avatar_urls[name] = (url, now + AVATAR_URL_TTL)
+    return url
+
+
+def encode_frame(payload, wire_format):
+    """
+    返回传给 consumer.send() 的参数
+    """
+    if wire_format == FORMAT_MSGPACK:
+        return {'bytes_data': msgpack.packb(compact(payload), use_bin_type=True)}
+    return {'text_data': json.dumps(payload)}
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data, raw=False)
+    return json.loads(text_data)
+
+
+class WireFormatMixin:
+    """
+    给 Consumer 用：connect 时调用 negotiate_wire_format()，之后用 send_payload() 发送
+    """
+    wire_format = FORMAT_JSON
+
+    def negotiate_wire_format(self):
+        self.wire_format = negotiate_format(self.scope)
+
+    @property
+    def binary_frames(self):
+        return self.wire_format == FORMAT_MSGPACK
+
+    async def send_payload(self, payload):
+        await self.send(**encode_frame(payload, self.wire_format))
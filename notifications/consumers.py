@@ -1,11 +1,14 @@
 # backend/notifications/consumers.py
-import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from core.wire import WireFormatMixin
+from users.presence import PresenceMixin
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(WireFormatMixin, PresenceMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
+        # JSON 文本帧 (默认) 或 msgpack 二进制帧 (?format=msgpack)
+        self.negotiate_wire_format()
 
         # 只有登录用户才能连接通知通道
         if self.user.is_anonymous:
@@ -19,9 +22,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            # 登记在线状态 (离线用户的通知不会实时推送)
+            # 放在 accept 之前，保证客户端连上之后的第一条通知就能推到
+            await self.presence_connect()
             await self.accept()
 
     async def disconnect(self, close_code):
+        await self.presence_disconnect()
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(
                 self.group_name,
@@ -31,4 +38,4 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     # 处理来自信号 (Signal) 的消息
     async def send_notification(self, event):
         # 将消息转发给前端 WebSocket
-        await self.send(text_data=json.dumps(event['content']))
\ No newline at end of file
+        await self.send_payload(event['content'])
\ No newline at end of file
@@ -1,6 +1,7 @@
 # backend/notifications/models.py
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Notification(models.Model):
@@ -30,9 +31,97 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # 最后一次变化 (已读 / 聚合更新) 的时间，增量同步 /api/v1/sync/ 据此找出变化的通知
+    # 注意 QuerySet.update / bulk_update 不会自动刷新它，需要手动带上
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # 聚合通知 ("某某等 N 人赞了你的帖子")：
+    # 同一个接收者、同一类型、同一个帖子在时间窗口内的通知合并成一行 (见 tasks.py)
+    # actor 是最近的那个触发者，全部触发者记录在 NotificationActor 里
+    actor_count = models.PositiveIntegerField(default=1)
+    # 最近几个触发者的 ID (列表展示用，不需要再查 NotificationActor)
+    sample_actor_ids = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ['-created_at']  # 最新通知在最前
+        indexes = [
+            # 合并时查找时间窗口内未读的同类通知
+            models.Index(fields=['recipient', 'notification_type', 'post_id', 'created_at'],
+                         name='notif_aggregate_idx'),
+            # 归档任务按时间挑出已读的旧通知 (部分索引，只包含已读的)
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_read=True),
+                         name='notif_read_created_idx'),
+            models.Index(fields=['recipient', 'updated_at'], name='notif_recipient_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor} {self.notification_type} -> {self.recipient}"
+
+
+class NotificationArchive(models.Model):
+    """
+    归档的通知 (冷数据)
+    Notification 表只保留最近的 (以及所有未读的) 通知，已读超过保留期的由 tasks.archive_notifications
+    分批搬到这里；通知列表只查 Notification，用户往前翻到底时才查 /notifications/archive/
+    id 沿用原通知的 id；聚合通知只保留人数和最近的触发者，不再保留完整的触发者列表
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    post_id = models.IntegerField(null=True, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actor_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notif_archive_recipient_idx'),
+            # 超过归档保留期的按时间删除
+            models.Index(fields=['created_at'], name='notif_archive_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"[archive] {self.actor_id} {self.notification_type} -> {self.recipient_id}"
+
+
+class NotificationActor(models.Model):
+    """
+    聚合通知的全部触发者 (展开 "等 N 人" 时用)
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actor_entries')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('notification', 'actor')  # 同一个人只算一次 (比如取消再重新点赞)
+        ordering = ['-created_at']
+
+
+class NotificationOutbox(models.Model):
+    """
+    通知发件箱：信号处理函数只在触发事件的同一个事务里追加一行 (事务回滚就不会有通知)
+    由 Celery 任务 deliver_notifications 批量创建 Notification 并在提交后推送 (见 tasks.py)
+    推送成功才删除这一行，失败会退避重试，所以同一条通知可能推送不止一次，客户端按通知 id 去重
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    post_id = models.IntegerField(null=True, blank=True)
+
+    # 已经创建的通知 (重试时只推送，不再重复创建)
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # 已尝试推送的次数，以及下次可以被领取的时间 (领取后的租期 / 失败后的退避)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_at', 'id'], name='notif_outbox_available_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.actor} {self.notification_type} -> {self.recipient}"
\ No newline at end of file
+        return f"[outbox] {self.actor_id} {self.notification_type} -> {self.recipient_id}"
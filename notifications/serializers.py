@@ -1,6 +1,6 @@
 # backend/notifications/serializers.py
 from rest_framework import serializers
-from .models import Notification
+from .models import Notification, NotificationArchive
 from users.serializers import UserSerializer  # 复用我们现有的用户序列化器
 
 
@@ -10,4 +10,20 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ['id', 'notification_type', 'actor', 'post_id', 'is_read', 'created_at']
\ No newline at end of file
+        # actor 是最近的触发者；actor_count > 1 时是聚合通知，全部触发者见 /notifications/{id}/actors/
+        fields = ['id', 'notification_type', 'actor', 'actor_count', 'sample_actor_ids', 'post_id', 'is_read',
+                  'created_at']
+
+
+class NotificationArchiveSerializer(serializers.ModelSerializer):
+    # 字段和 NotificationSerializer 一致 (归档的都是已读的)
+    actor = UserSerializer(read_only=True)
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NotificationArchive
+        fields = ['id', 'notification_type', 'actor', 'actor_count', 'sample_actor_ids', 'post_id', 'is_read',
+                  'created_at']
+
+    def get_is_read(self, obj):
+        return True
@@ -0,0 +1,287 @@
+# backend/notifications/tasks.py
+from datetime import timedelta
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notification, NotificationActor, NotificationArchive, NotificationOutbox
+from .utils import NOTIFICATION_PUSH_INTERVAL, add_unread_counts, count_unread, push_notifications, set_unread_counts
+
+# 每批从发件箱领取多少条
+OUTBOX_BATCH_SIZE = 500
+# 一次任务最多处理多少批 (剩下的留给下一次定时任务)
+OUTBOX_MAX_BATCHES = 20
+# 领取后的租期 (秒)：期间其他 worker 不会再领取；worker 崩溃时租期到了会被重新领取
+OUTBOX_LEASE_SECONDS = 60
+# 推送失败时的退避 (秒，按次数翻倍) 和最多尝试次数
+OUTBOX_RETRY_DELAY = 5
+OUTBOX_MAX_ATTEMPTS = 5
+
+# 这些类型按 (接收者, 类型, 帖子) 合并成一条 "某某等 N 人..." 的通知
+AGGREGATE_TYPES = ('vote', 'comment', 'follow')
+# 只合并进这段时间内、还没读过的通知 (读过之后再来的会开一条新的)
+AGGREGATION_WINDOW = timedelta(hours=24)
+# 通知上保留几个最近的触发者
+SAMPLE_ACTORS = 3
+
+# 未读数校正：重新数一遍最近这段时间内收到过通知的用户
+UNREAD_RECONCILE_WINDOW = timedelta(minutes=15)
+
+# 已读通知在 Notification 表里保留多久，之后搬到 NotificationArchive；归档再保留多久后删除
+NOTIFICATION_RETENTION = timedelta(days=30)
+NOTIFICATION_ARCHIVE_RETENTION = timedelta(days=365)
+# 归档任务每批处理多少条、一次最多处理多少批 (每批一个短事务，不长时间锁表)
+ARCHIVE_CHUNK_SIZE = 1000
+ARCHIVE_MAX_CHUNKS = 50
+
+
+def aggregate_notifications(entries, now):
+    """
+    把可合并的发件箱记录并入已有的通知 (没有就新建一条)，原地更新触发者人数和最近的触发者，
+    并把 created_at 提到现在 (让它回到通知列表最上面)
+    """
+    groups = {}
+    for entry in entries:
+        groups.setdefault((entry.recipient_id, entry.notification_type, entry.post_id), []).append(entry)
+
+    aggregates = {}
+    candidates = Notification.objects.select_for_update().filter(
+        recipient_id__in={key[0] for key in groups},
+        notification_type__in={key[1] for key in groups},
+        is_read=False,
+        created_at__gte=now - AGGREGATION_WINDOW
+    ).order_by('created_at')
+    for notification in candidates:
+        key = (notification.recipient_id, notification.notification_type, notification.post_id)
+        if key in groups:
+            aggregates[key] = notification  # 按时间升序，留下最新的一条
+
+    new_keys = [key for key in groups if key not in aggregates]
+    aggregates.update(zip(new_keys, Notification.objects.bulk_create([
+        Notification(recipient_id=key[0], actor_id=groups[key][-1].actor_id, notification_type=key[1], post_id=key[2])
+        for key in new_keys
+    ])))
+
+    # 已有通知自己的 actor 也补一条记录 (上线聚合之前创建的通知没有触发者记录)
+    actors = [
+        NotificationActor(notification=notification, actor_id=notification.actor_id)
+        for key, notification in aggregates.items()
+        if key not in new_keys
+    ]
+    actors += [
+        NotificationActor(notification=aggregates[key], actor_id=entry.actor_id)
+        for key, group in groups.items()
+        for entry in group
+    ]
+    NotificationActor.objects.bulk_create(actors, ignore_conflicts=True)
+    actor_counts = dict(
+        NotificationActor.objects
+        .filter(notification__in=list(aggregates.values()))
+        .values('notification')
+        .annotate(count=Count('id'))
+        .values_list('notification', 'count')
+    )
+
+    for key, group in groups.items():
+        notification = aggregates[key]
+        latest_actor_ids = [entry.actor_id for entry in reversed(group)]
+        notification.sample_actor_ids = list(dict.fromkeys(latest_actor_ids + notification.sample_actor_ids))[:SAMPLE_ACTORS]
+        notification.actor_id = group[-1].actor_id
+        notification.actor_count = actor_counts.get(notification.id, 1)
+        notification.created_at = now
+        notification.updated_at = now
+        for entry in group:
+            entry.notification = notification
+    Notification.objects.bulk_update(
+        list(aggregates.values()), ['actor', 'actor_count', 'sample_actor_ids', 'created_at', 'updated_at']
+    )
+    # 返回新建的通知 (合并进已有通知的不会增加未读数)
+    return [aggregates[key] for key in new_keys]
+
+
+def claim_outbox_entries(batch_size):
+    """
+    领取一批到期的发件箱记录，为还没有通知的记录批量创建 Notification
+    在同一个事务里把它们的 available_at 推到租期之后，提交后再推送 (推送期间不持有行锁)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        if not entries:
+            return []
+
+        pending = [entry for entry in entries if entry.notification_id is None]
+        single = [entry for entry in pending if entry.notification_type not in AGGREGATE_TYPES]
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=entry.recipient_id,
+                actor_id=entry.actor_id,
+                notification_type=entry.notification_type,
+                post_id=entry.post_id
+            )
+            for entry in single
+        ])
+        for entry, notification in zip(single, notifications):
+            entry.notification = notification
+        aggregated = [entry for entry in pending if entry.notification_type in AGGREGATE_TYPES]
+        if aggregated:
+            notifications += aggregate_notifications(aggregated, now)
+
+        lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        for entry in entries:
+            entry.attempts += 1
+            entry.available_at = lease_until
+        NotificationOutbox.objects.bulk_update(entries, ['notification', 'attempts', 'available_at'])
+
+    # 提交之后再给新通知的接收者加未读数
+    unread_deltas = {}
+    for notification in notifications:
+        unread_deltas[notification.recipient_id] = unread_deltas.get(notification.recipient_id, 0) + 1
+    add_unread_counts(unread_deltas)
+    return entries
+
+
+def deliver_entries(entries):
+    """
+    推送一批已领取的记录；成功就删除，失败就退避重试 (超过次数放弃推送，通知本身已经落库)
+    接收者刚推送过 (限流) 的记录留到限流结束后再推，那时聚合通知已经是最新的状态
+    返回是否推送成功
+    """
+    # 合并到同一条通知的记录只推一次，多余的直接删掉
+    latest = {}
+    for entry in entries:
+        latest[entry.notification_id] = entry
+    duplicates = [entry.id for entry in entries if latest[entry.notification_id] is not entry]
+    if duplicates:
+        NotificationOutbox.objects.filter(id__in=duplicates).delete()
+    entries = list(latest.values())
+
+    # 推送前重新读一次 (聚合通知可能刚被别的批次更新过，推送的总是最新状态)
+    notifications = Notification.objects.select_related('actor').in_bulk(list(latest))
+
+    try:
+        limited = push_notifications(list(notifications.values()))
+    except Exception as e:
+        print(f"❌ Notification push failed: {e}")
+        now = timezone.now()
+        retry = [entry for entry in entries if entry.attempts < OUTBOX_MAX_ATTEMPTS]
+        for entry in retry:
+            entry.available_at = now + timedelta(seconds=OUTBOX_RETRY_DELAY * 2 ** (entry.attempts - 1))
+        NotificationOutbox.objects.bulk_update(retry, ['available_at'])
+        NotificationOutbox.objects.filter(
+            id__in=[entry.id for entry in entries if entry.attempts >= OUTBOX_MAX_ATTEMPTS]
+        ).delete()
+        return False
+
+    deferred = [entry for entry in entries if entry.recipient_id in limited]
+    if deferred:
+        available_at = timezone.now() + timedelta(seconds=NOTIFICATION_PUSH_INTERVAL)
+        for entry in deferred:
+            entry.attempts -= 1  # 限流不算失败
+            entry.available_at = available_at
+        NotificationOutbox.objects.bulk_update(deferred, ['attempts', 'available_at'])
+    NotificationOutbox.objects.filter(
+        id__in=[entry.id for entry in entries if entry.recipient_id not in limited]
+    ).delete()
+    return True
+
+
+@shared_task
+def deliver_notifications(batch_size=OUTBOX_BATCH_SIZE, max_batches=OUTBOX_MAX_BATCHES):
+    """
+    Celery 定时任务 (见 settings.CELERY_BEAT_SCHEDULE)：把发件箱里的通知落库并推送
+    多个 worker 同时运行也没关系 (SKIP LOCKED 加租期，各自领取不同的记录)
+    """
+    delivered = 0
+    for _ in range(max_batches):
+        entries = claim_outbox_entries(batch_size)
+        if not entries:
+            break
+        if not deliver_entries(entries):
+            # 推送通道 (Redis) 有问题，这次先停下，等下一次定时任务
+            break
+        delivered += len(entries)
+    return delivered
+
+
+@shared_task
+def reconcile_unread_counts(window_seconds=UNREAD_RECONCILE_WINDOW.total_seconds()):
+    """
+    Celery 定时任务：把最近收到过通知的用户的未读数计数器按数据库校正一遍
+    (计数器在并发下可能有少量偏差，其余用户的计数器过期后会自然回源)
+    """
+    since = timezone.now() - timedelta(seconds=window_seconds)
+    user_ids = list(
+        Notification.objects.filter(created_at__gte=since).values_list('recipient_id', flat=True).distinct()
+    )
+    if user_ids:
+        set_unread_counts(count_unread(user_ids))
+    return len(user_ids)
+
+
+def archive_chunk(cutoff, chunk_size):
+    """
+    把一批已读且早于 cutoff 的通知搬到归档表，返回搬了多少条
+    """
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(is_read=True, created_at__lt=cutoff)
+            .order_by('created_at', 'id')[:chunk_size]
+        )
+        if not notifications:
+            return 0
+        NotificationArchive.objects.bulk_create([
+            NotificationArchive(
+                id=notification.id,
+                recipient_id=notification.recipient_id,
+                actor_id=notification.actor_id,
+                notification_type=notification.notification_type,
+                post_id=notification.post_id,
+                actor_count=notification.actor_count,
+                sample_actor_ids=notification.sample_actor_ids,
+                created_at=notification.created_at
+            )
+            for notification in notifications
+        ], ignore_conflicts=True)
+        # 触发者记录 (NotificationActor) 随之级联删除
+        Notification.objects.filter(id__in=[notification.id for notification in notifications]).delete()
+    return len(notifications)
+
+
+def purge_archive_chunk(cutoff, chunk_size):
+    ids = list(
+        NotificationArchive.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list('id', flat=True)[:chunk_size]
+    )
+    if ids:
+        NotificationArchive.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+@shared_task
+def archive_notifications(chunk_size=ARCHIVE_CHUNK_SIZE, max_chunks=ARCHIVE_MAX_CHUNKS):
+    """
+    Celery 定时任务：分批归档已读的旧通知，并删除超过归档保留期的记录
+    (未读的通知不管多旧都留在 Notification 表里)
+    """
+    now = timezone.now()
+    archived = purged = 0
+    for _ in range(max_chunks):
+        count = archive_chunk(now - NOTIFICATION_RETENTION, chunk_size)
+        archived += count
+        if count < chunk_size:
+            break
+    for _ in range(max_chunks):
+        count = purge_archive_chunk(now - NOTIFICATION_ARCHIVE_RETENTION, chunk_size)
+        purged += count
+        if count < chunk_size:
+            break
+    return f"archived {archived}, purged {purged}"
@@ -0,0 +1,149 @@
+# backend/notifications/utils.py
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db.models import Count
+
+from users.presence import get_presence
+from .models import Notification, NotificationOutbox
+
+# 每个接收者最多每隔这么多秒推送一次 (点赞很多的帖子不会把作者的连接刷屏)
+NOTIFICATION_PUSH_INTERVAL = 5
+
+# 未读数计数器 (缓存在 Redis 里，导航栏轮询不用每次 COUNT)
+# 新通知 +1，标记已读 -1，全部已读清零；过期或缺失时回源数据库重新数一次，
+# 另有定时任务 reconcile_unread_counts 校正最近有变化的用户
+UNREAD_COUNT_TTL = 60 * 60
+
+
+def enqueue_notification(recipient_id, actor_id, notification_type, post_id=None):
+    """
+    追加一条待发送的通知 (和触发它的关注 / 评论 / 点赞 / 私信在同一个事务里)
+    真正创建 Notification 和推送由 tasks.deliver_notifications 完成
+    只需要 ID，不用为了发通知去加载用户
+    """
+    return NotificationOutbox.objects.create(
+        recipient_id=recipient_id,
+        actor_id=actor_id,
+        notification_type=notification_type,
+        post_id=post_id
+    )
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def count_unread(user_ids):
+    """
+    从数据库数未读数 (一条 GROUP BY)，返回 {user_id: count}
+    """
+    counts = dict(
+        Notification.objects
+        .filter(recipient_id__in=user_ids, is_read=False)
+        .values('recipient')
+        .annotate(count=Count('id'))
+        .values_list('recipient', 'count')
+    )
+    return {user_id: counts.get(user_id, 0) for user_id in user_ids}
+
+
+def get_unread_counts(user_ids):
+    """
+    批量读取未读数，缓存里没有的回源数据库并写回缓存
+    """
+    user_ids = list(user_ids)
+    cached = cache.get_many([unread_count_key(user_id) for user_id in user_ids])
+    counts = {}
+    missing = []
+    for user_id in user_ids:
+        value = cached.get(unread_count_key(user_id))
+        if value is None:
+            missing.append(user_id)
+        else:
+            counts[user_id] = max(int(value), 0)
+    if missing:
+        fresh = count_unread(missing)
+        set_unread_counts(fresh)
+        counts.update(fresh)
+    return counts
+
+
+def get_unread_count(user_id):
+    return get_unread_counts([user_id])[user_id]
+
+
+def set_unread_counts(counts):
+    cache.set_many({unread_count_key(user_id): count for user_id, count in counts.items()}, UNREAD_COUNT_TTL)
+
+
+def add_unread_counts(deltas):
+    """
+    按 {user_id: 增量} 调整计数器；计数器不存在时不用管 (下次读取会回源数据库)
+    """
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            value = cache.incr(unread_count_key(user_id), delta)
+        except ValueError:
+            continue
+        if value < 0:
+            # 计数器已经和数据库对不上了，删掉让下次读取回源
+            cache.delete(unread_count_key(user_id))
+
+
+def notification_payload(notification, unread_count=None):
+    return {
+        "type": "new_notification",
+        # 同一条通知可能推送不止一次 (至少一次投递)，前端按 id 去重
+        "id": notification.id,
+        "notification_type": notification.notification_type,
+        "actor_name": notification.actor.username,
+        "actor_count": notification.actor_count,
+        "post_id": notification.post_id,
+        # 推送时带上最新的未读数，前端不用再轮询 unread_count
+        "unread_count": unread_count,
+    }
+
+
+def acquire_push_slots(recipient_ids):
+    """
+    推送限流：返回这一刻允许推送的接收者 (cache.add 只有 key 不存在时才会成功，是原子的)
+    """
+    return {
+        recipient_id for recipient_id in recipient_ids
+        if cache.add(f"notifications:push:{recipient_id}", 1, NOTIFICATION_PUSH_INTERVAL)
+    }
+
+
+async def group_send_many(messages):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*[
+        channel_layer.group_send(group_name, event)
+        for group_name, event in messages
+    ])
+
+
+def push_notifications(notifications):
+    """
+    批量推送：一次查出哪些接收者在线，再在同一个事件循环里并发 group_send
+    不在线 (没有任何 WebSocket 连接) 的就不用推了，下次打开通知列表时会拉到
+    返回因为限流这次没有推送的接收者 ID
+    """
+    online = get_presence().online_user_ids({notification.recipient_id for notification in notifications})
+    allowed = acquire_push_slots(online)
+    unread_counts = get_unread_counts(allowed) if allowed else {}
+    messages = [
+        (f"notify_user_{notification.recipient_id}", {
+            "type": "send_notification",  # 对应 Consumer 中的方法名
+            "content": notification_payload(notification, unread_counts[notification.recipient_id])
+        })
+        for notification in notifications
+        if notification.recipient_id in allowed
+    ]
+    if messages:
+        async_to_sync(group_send_many)(messages)
+    return online - allowed
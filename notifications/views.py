@@ -1,9 +1,17 @@
 # backend/notifications/views.py
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Notification
-from .serializers import NotificationSerializer
+from users.serializers import UserSerializer
+from .models import Notification, NotificationActor, NotificationArchive
+from .serializers import NotificationArchiveSerializer, NotificationSerializer
+from .utils import add_unread_counts, get_unread_count, set_unread_counts
+
+ARCHIVE_PAGE_SIZE = 20
+ARCHIVE_MAX_PAGE_SIZE = 100
+
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
@@ -17,22 +25,73 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     # URL: /api/v1/notifications/unread_count/
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        # 读的是缓存里的计数器 (见 utils.py)，新通知推送时也会带上这个数
+        return Response({'count': get_unread_count(request.user.id)})
 
     # (2) 标记某条通知为已读
     # URL: /api/v1/notifications/{id}/read/
     @action(detail=True, methods=['post'])
     def read(self, request, pk=None):
         notification = self.get_object()
-        if not notification.is_read:
-            notification.is_read = True
-            notification.save()
+        # 条件更新：并发重复点击时只有一次会真正把它从未读变成已读，计数器只减一次
+        if self.get_queryset().filter(pk=notification.pk, is_read=False).update(is_read=True, updated_at=timezone.now()):
+            add_unread_counts({request.user.id: -1})
         return Response({'status': 'marked as read'})
 
     # (3) 标记所有为已读 (一键清除红点)
     # URL: /api/v1/notifications/mark_all_read/
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().filter(is_read=False).update(is_read=True)
-        return Response({'status': 'all marked as read'})
\ No newline at end of file
+        self.get_queryset().filter(is_read=False).update(is_read=True, updated_at=timezone.now())
+        set_unread_counts({request.user.id: 0})
+        return Response({'status': 'all marked as read'})
+
+    # (4) 展开聚合通知的全部触发者 ("某某等 N 人赞了你的帖子" 里的 N 人)，最近的在前
+    # URL: /api/v1/notifications/{id}/actors/
+    @action(detail=True, methods=['get'])
+    def actors(self, request, pk=None):
+        notification = self.get_object()
+        entries = NotificationActor.objects.filter(notification=notification).select_related('actor')
+        if not entries.exists():
+            # 不聚合的类型 (比如私信) 没有触发者记录，只有 actor 本身
+            return Response(UserSerializer([notification.actor], many=True).data)
+
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            serializer = UserSerializer([entry.actor for entry in page], many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = UserSerializer([entry.actor for entry in entries], many=True)
+        return Response(serializer.data)
+
+    # (5) 更早的 (已归档的) 通知：通知列表翻到底之后才查这里，游标分页，新的在前
+    # URL: /api/v1/notifications/archive/?limit=20
+    #      往前翻页: ?before=<当前最早一条的 id>
+    @action(detail=False, methods=['get'])
+    def archive(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', ARCHIVE_PAGE_SIZE)), 1), ARCHIVE_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = ARCHIVE_PAGE_SIZE
+
+        archived = NotificationArchive.objects.filter(recipient=request.user).select_related('actor')
+        before = request.query_params.get('before')
+        if before:
+            # 游标是归档通知的 id，按 (created_at, id) 定位，走 notif_archive_recipient_idx 索引
+            cursor = None
+            if before.isdigit():
+                cursor = archived.filter(id=before).values('created_at', 'id').first()
+            if cursor is None:
+                return Response({'detail': '无效的游标'}, status=status.HTTP_400_BAD_REQUEST)
+            archived = archived.filter(
+                Q(created_at__lt=cursor['created_at']) |
+                Q(created_at=cursor['created_at'], id__lt=cursor['id'])
+            )
+
+        # 多取一条，用来判断还有没有下一页
+        page = list(archived.order_by('-created_at', '-id')[:limit + 1])
+        serializer = NotificationArchiveSerializer(page[:limit], many=True)
+        return Response({
+            'results': serializer.data,
+            'has_more': len(page) > limit
+        })
\ No newline at end of file
@@ -1,9 +1,17 @@
 # backend/posts/consumers.py
-import json
+import msgpack
 from channels.generic.websocket import AsyncWebsocketConsumer
+from core.wire import WireFormatMixin, decode_frame
+from users.presence import RoomOccupancyMixin
+from .live import feed_room_name
 
-class PostConsumer(AsyncWebsocketConsumer):
+# 信息流连接最多同时关注多少个帖子
+MAX_FEED_POSTS = 100
+
+class PostConsumer(WireFormatMixin, RoomOccupancyMixin, AsyncWebsocketConsumer):
     async def connect(self):
+        # JSON 文本帧 (默认) 或 msgpack 二进制帧 (?format=msgpack)
+        self.negotiate_wire_format()
         # 从 URL 获取 post_id
         self.post_id = self.scope['url_route']['kwargs']['post_id']
         self.room_group_name = f'post_{self.post_id}'
@@ -13,19 +21,78 @@ class PostConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # 登记房间占用 (没人在看的帖子不广播新评论)
+        await self.room_enter(self.room_group_name)
         await self.accept()
 
     async def disconnect(self, close_code):
+        await self.room_exit_all()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    # 接收来自 signal 的新评论消息
-    async def send_new_comment(self, event):
-        comment = event['comment']
+    # 接收新评论 (posts.tasks.flush_live_comments 把一小段时间内的评论合并成一批)
+    async def send_new_comments(self, event):
         # 发送给前端
-        await self.send(text_data=json.dumps({
-            'type': 'new_comment',
-            'comment': comment
-        }))
\ No newline at end of file
+        await self.send_payload({
+            'type': 'new_comments',
+            'comments': event['comments']
+        })
+    # 分数 / 评论数有变化 (posts.tasks.flush_post_stats，每个帖子每秒最多一次)
+    async def send_post_stats(self, event):
+        await self.send_payload({
+            'type': 'post_stats',
+            'score': event['score'],
+            'comments_count': event['comments_count']
+        })
+
+
+class FeedConsumer(WireFormatMixin, RoomOccupancyMixin, AsyncWebsocketConsumer):
+    """
+    信息流卡片的实时分数 / 评论数 (不用为了更新几个数字重新拉列表)
+    客户端发送当前屏幕上的帖子 ID，每次发送都替换之前的集合:
+        {"action": "watch", "post_ids": [1, 2, 3]}
+    服务端推送:
+        {"type": "post_stats", "post_id": 1, "score": 10, "comments_count": 3}
+    """
+
+    async def connect(self):
+        self.negotiate_wire_format()
+        self.post_ids = set()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.room_exit_all()
+        for post_id in self.post_ids:
+            await self.channel_layer.group_discard(feed_room_name(post_id), self.channel_name)
+        self.post_ids = set()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            frame = decode_frame(text_data, bytes_data)
+            post_ids = {int(post_id) for post_id in frame['post_ids']} if frame['action'] == 'watch' else None
+        except (ValueError, KeyError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+            post_ids = None
+        if post_ids is None:
+            await self.send_payload({'type': 'error', 'detail': '帧格式错误'})
+            return
+        if len(post_ids) > MAX_FEED_POSTS:
+            await self.send_payload({'type': 'error', 'detail': f'最多同时关注 {MAX_FEED_POSTS} 个帖子'})
+            return
+
+        for post_id in self.post_ids - post_ids:
+            await self.channel_layer.group_discard(feed_room_name(post_id), self.channel_name)
+            await self.room_exit(feed_room_name(post_id))
+        for post_id in post_ids - self.post_ids:
+            await self.channel_layer.group_add(feed_room_name(post_id), self.channel_name)
+            await self.room_enter(feed_room_name(post_id))
+        self.post_ids = post_ids
+
+    async def send_feed_post_stats(self, event):
+        await self.send_payload({
+            'type': 'post_stats',
+            'post_id': event['post_id'],
+            'score': event['score'],
+            'comments_count': event['comments_count']
+        })
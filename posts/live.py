@@ -0,0 +1,147 @@
+# backend/posts/live.py
+"""
+帖子页的实时评论广播 (组 post_{id}，PostConsumer / 多路复用连接的 post:<id> 主题)
+
+- 没有人在看这个帖子 (房间占用为 0，见 users/presence.py) 就直接跳过，不构造也不广播
+- 短时间内的多条评论先追加到 Redis 列表里，由 Celery 任务 flush_live_comments 在
+  COALESCE_DELAY 之后一次性取出，合并成一个 new_comments 帧广播
+
+帖子的分数 / 评论数 (post_stats 帧) 同时推给帖子页和信息流卡片 (组 feed_post_{id}，
+FeedConsumer / 多路复用连接的 feed:<id> 主题)：投票和评论只标记"有变化"，
+每个帖子每 STATS_PUSH_INTERVAL 秒最多由 flush_post_stats 推送一次最新的数字
+"""
+import json
+
+from django_redis import get_redis_connection
+
+from users.presence import get_presence
+
+# 合并窗口 (秒)：窗口内的评论合并成一帧
+COALESCE_DELAY = 0.3
+# "已经安排了刷新任务" 标记的有效期 (毫秒)，比合并窗口略短，
+# 保证任务执行时标记已经过期，之后到达的评论会安排新的任务，不会滞留在列表里
+SCHEDULED_FLAG_TTL_MS = 250
+
+# 分数 / 评论数的推送间隔 (秒)
+STATS_PUSH_INTERVAL = 1.0
+# "推送进行中" 标记的有效期 (毫秒)：标记由 flush_post_stats 推送后续期、没有新变化时删除，
+# 有效期只是兜底 (任务丢了也不会永远不推)，所以必须比推送间隔长，否则一个间隔内会推两次
+STATS_FLAG_TTL_MS = 5000
+
+
+def room_name(post_id):
+    return f'post_{post_id}'
+
+
+def feed_room_name(post_id):
+    return f'feed_post_{post_id}'
+
+
+def _pending_key(post_id):
+    return f'posts:live_comments:{post_id}'
+
+
+def _scheduled_key(post_id):
+    return f'posts:live_comments:scheduled:{post_id}'
+
+
+def _stats_scheduled_key(post_id):
+    return f'posts:live_stats:scheduled:{post_id}'
+
+
+def _stats_dirty_key(post_id):
+    return f'posts:live_stats:dirty:{post_id}'
+
+
+def has_viewers(post_id):
+    return get_presence().room_occupancy(room_name(post_id)) > 0
+
+
+def has_stats_viewers(post_id):
+    presence = get_presence()
+    return (
+        presence.room_occupancy(room_name(post_id)) > 0 or
+        presence.room_occupancy(feed_room_name(post_id)) > 0
+    )
+
+
+def queue_live_comment(post_id, comment_data):
+    """
+    追加一条待广播的评论；窗口内第一条评论负责安排刷新任务
+    """
+    from .tasks import flush_live_comments
+
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.rpush(_pending_key(post_id), json.dumps(comment_data))
+    pipe.expire(_pending_key(post_id), 60)
+    pipe.set(_scheduled_key(post_id), 1, nx=True, px=SCHEDULED_FLAG_TTL_MS)
+    _, _, scheduled = pipe.execute()
+    if scheduled:
+        flush_live_comments.apply_async((post_id,), countdown=COALESCE_DELAY)
+
+
+def drain_live_comments(post_id):
+    """
+    原子地取出并清空待广播的评论 (按发布顺序)
+    """
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()  # 默认是 MULTI/EXEC 事务
+    pipe.lrange(_pending_key(post_id), 0, -1)
+    pipe.delete(_pending_key(post_id))
+    items, _ = pipe.execute()
+    return [json.loads(item) for item in items]
+
+
+def queue_post_stats(post_id):
+    """
+    标记帖子的分数 / 评论数有变化；没有推送在进行时负责安排推送任务 (任务执行时再读最新的数字)
+    """
+    from .tasks import flush_post_stats
+
+    if not has_stats_viewers(post_id):
+        return
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.set(_stats_dirty_key(post_id), 1, ex=60)
+    pipe.set(_stats_scheduled_key(post_id), 1, nx=True, px=STATS_FLAG_TTL_MS)
+    _, scheduled = pipe.execute()
+    if scheduled:
+        flush_post_stats.apply_async((post_id,), countdown=STATS_PUSH_INTERVAL)
+
+
+def take_post_stats_changes(post_id):
+    """
+    原子地取出并清除"有变化"标记；返回 True 表示上次推送之后有新的变化
+    """
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.get(_stats_dirty_key(post_id))
+    pipe.delete(_stats_dirty_key(post_id))
+    dirty, _ = pipe.execute()
+    return dirty is not None
+
+
+def rearm_post_stats(post_id):
+    """
+    推送之后续期标记并在一个间隔后再检查一次：间隔内的新变化由那次检查推送，保证每个间隔最多推一次
+    """
+    from .tasks import flush_post_stats
+
+    redis = get_redis_connection('default')
+    redis.set(_stats_scheduled_key(post_id), 1, px=STATS_FLAG_TTL_MS)
+    flush_post_stats.apply_async((post_id,), countdown=STATS_PUSH_INTERVAL)
+
+
+def release_post_stats(post_id):
+    """
+    一个间隔内没有新变化：删除标记，之后的第一次变化重新安排推送
+    删除之后再看一眼"有变化"标记，补上删除前一刻到达、因为标记还在而没有安排任务的变化
+    """
+    from .tasks import flush_post_stats
+
+    redis = get_redis_connection('default')
+    redis.delete(_stats_scheduled_key(post_id))
+    if redis.exists(_stats_dirty_key(post_id)) and \
+            redis.set(_stats_scheduled_key(post_id), 1, nx=True, px=STATS_FLAG_TTL_MS):
+        flush_post_stats.apply_async((post_id,), countdown=STATS_PUSH_INTERVAL)
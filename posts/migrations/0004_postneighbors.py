@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_alter_vote_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostNeighbors',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='neighbors', serialize=False, to='posts.post')),
+                ('same_topic_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+                ('cross_topic_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
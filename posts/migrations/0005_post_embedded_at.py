@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_postneighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='embedded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 
 # 导入我们刚创建的 Topic 模型
 from topics.models import Topic
@@ -27,6 +28,8 @@ class Post(models.Model):
     # 阿里云 text-embedding-v1/v2 模型的维度通常是 1536
     # 我们允许它为空，因为老帖子暂时没有向量
     embedding = VectorField(dimensions=1536, blank=True, null=True)
+    # 向量生成的时间 (早于 updated_at 说明帖子改过，向量已过期)
+    embedded_at = models.DateTimeField(blank=True, null=True)
 
     view_count = models.PositiveIntegerField(default=0, verbose_name="浏览量")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -151,4 +154,22 @@ class PostImage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Image for {self.post.title}"
\ No newline at end of file
+        return f"Image for {self.post.title}"
+
+
+class PostNeighbors(models.Model):
+    """
+    预计算的"相关帖子"列表 (由 ai_agent 在生成向量后写入)
+    每个帖子一行，只存相似帖子的 ID，详情页直接按主键查一次即可
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="neighbors")
+
+    # 同话题下最相似的帖子 ID (按相似度从高到低)
+    same_topic_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    # 跨话题最相似的帖子 ID (按相似度从高到低)
+    cross_topic_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Neighbors of post {self.post_id}"
\ No newline at end of file
@@ -4,4 +4,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/posts/(?P<post_id>\d+)/$', consumers.PostConsumer.as_asgi()),
+    re_path(r'ws/posts/feed/$', consumers.FeedConsumer.as_asgi()),
 ]
\ No newline at end of file
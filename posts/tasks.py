@@ -1,6 +1,12 @@
 # posts/tasks.py
+from asgiref.sync import async_to_sync
 from celery import shared_task
-from .models import AssociatedProduct
+from channels.layers import get_channel_layer
+from django.db.models import Sum
+from .live import (
+    drain_live_comments, feed_room_name, rearm_post_stats, release_post_stats, room_name, take_post_stats_changes,
+)
+from .models import AssociatedProduct, Comment, Vote
 
 # 导入爬虫库
 import requests
@@ -148,4 +154,48 @@ def task_scrape_product(product_id):
         # 抓取失败
         product.scrape_status = AssociatedProduct.ScrapeStatus.FAILED
         product.save()
-        return f"Failed: Could not scrape {product.original_url}"
\ No newline at end of file
+        return f"Failed: Could not scrape {product.original_url}"
+
+
+@shared_task
+def flush_live_comments(post_id):
+    """
+    把合并窗口内的新评论一次性广播给正在看帖子的人 (一个 new_comments 帧)
+    """
+    comments = drain_live_comments(post_id)
+    if not comments:
+        return 0
+    async_to_sync(get_channel_layer().group_send)(
+        room_name(post_id),
+        {
+            "type": "send_new_comments",  # 对应 Consumer 的方法
+            "post_id": post_id,
+            "comments": comments
+        }
+    )
+    return len(comments)
+
+
+async def _send_post_stats(post_id, score, comments_count):
+    channel_layer = get_channel_layer()
+    stats = {"post_id": post_id, "score": score, "comments_count": comments_count}
+    # 帖子页和信息流卡片是两个组 (同一个连接可能两个都订阅了，各自带自己的 topic)
+    await channel_layer.group_send(room_name(post_id), {"type": "send_post_stats", **stats})
+    await channel_layer.group_send(feed_room_name(post_id), {"type": "send_feed_post_stats", **stats})
+
+
+@shared_task
+def flush_post_stats(post_id):
+    """
+    把帖子最新的分数和评论数推给正在看的人 (帖子页 + 信息流卡片)
+    上次推送之后没有新变化就不推，只释放标记 (见 posts/live.py 的 queue_post_stats)
+    """
+    if not take_post_stats_changes(post_id):
+        release_post_stats(post_id)
+        return None
+    # 分开两次聚合，避免 votes 和 comments 连表后互相放大
+    score = Vote.objects.filter(post_id=post_id).aggregate(total=Sum('vote_type'))['total'] or 0
+    comments_count = Comment.objects.filter(post_id=post_id).count()
+    async_to_sync(_send_post_stats)(post_id, score, comments_count)
+    rearm_post_stats(post_id)
+    return score, comments_count
@@ -5,7 +5,7 @@ from django.db.models import Sum, IntegerField, Value, Count
 from django.db.models.functions import Coalesce
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from .models import Post, Vote, Comment
+from .models import Post, Vote, Comment, PostNeighbors
 from .serializers import (
     PostListRetrieveSerializer,
     PostCreateSerializer,
@@ -16,7 +16,11 @@ from django.db.models import Q
 from users.models import UserBlock
 import django_filters
 from django.utils import timezone
+from django.db import transaction
 from datetime import timedelta
+from ai_agent.interests import mark_seen, for_you_candidate_ids
+from ai_agent.tasks import update_user_interest
+from .live import queue_post_stats
 
 # 自定义时间过滤器
 class PostFilter(django_filters.FilterSet):
@@ -90,6 +94,9 @@ class PostViewSet(
         # 2. 预加载 (Select) 关联对象
         queryset = queryset.select_related('author', 'topic', 'product')
 
+        # 列表/详情用不到向量，不要把 1536 维的 embedding 也读出来
+        queryset = queryset.defer('embedding')
+
         # 3. (新) 注解 (Annotate) score 字段
         #    Coalesce(Sum('...'), 0) 确保没有投票的帖子返回 0 而不是 None
         queryset = queryset.annotate(
@@ -116,6 +123,18 @@ class PostViewSet(
     def perform_create(self, serializer):
         serializer.save()
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+
+        # 记录"看过"，第一次看的时候顺便更新兴趣向量 (用于"猜你喜欢")
+        user = request.user
+        if user.is_authenticated:
+            post_id = response.data['id']
+            if mark_seen(user.id, post_id):
+                transaction.on_commit(lambda: update_user_interest.delay(user.id, post_id, 'view'))
+
+        return response
+
     # 核心：我们新的 "vote" 动作
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def vote(self, request, pk=None):
@@ -152,7 +171,10 @@ class PostViewSet(
             Vote.objects.create(post=post, user=user, vote_type=vote_type)
             status_code = status.HTTP_201_CREATED  # 201 = Created
 
-        # 5. 重新计算帖子的总分并返回给前端
+        # 5. 分数变了，推给正在看这个帖子的人 (帖子页 + 信息流卡片，合并推送)
+        transaction.on_commit(lambda: queue_post_stats(post.id))
+
+        # 6. 重新计算帖子的总分并返回给前端
         new_score = post.votes.aggregate(
             total=Coalesce(Sum('vote_type'), 0, output_field=IntegerField())
         ).get('total')
@@ -244,4 +266,65 @@ class PostViewSet(
             return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def related(self, request, pk=None):
+        """
+        获取"相关帖子" (由后台任务预计算)
+        URL: /api/v1/posts/{id}/related/
+        返回: { "same_topic": [...], "cross_topic": [...] }
+        """
+        # 1. 按主键查一次预计算好的 ID 列表
+        neighbors = PostNeighbors.objects.filter(post_id=pk).values_list(
+            'same_topic_ids', 'cross_topic_ids'
+        ).first()
+        if neighbors is None:
+            if not Post.objects.filter(pk=pk).exists():
+                return Response({'detail': '帖子不存在'}, status=status.HTTP_404_NOT_FOUND)
+            # 向量还没生成好，先返回空列表
+            return Response({'same_topic': [], 'cross_topic': []})
+
+        same_topic_ids, cross_topic_ids = neighbors
+
+        # 2. 一次性批量取出帖子详情 (get_queryset 会顺便过滤掉拉黑的作者)
+        posts_by_id = {
+            post.id: post
+            for post in self.get_queryset().filter(id__in=same_topic_ids + cross_topic_ids)
+        }
+
+        # 3. 按预计算的相似度顺序返回
+        def serialize(ids):
+            posts = [posts_by_id[post_id] for post_id in ids if post_id in posts_by_id]
+            return self.get_serializer(posts, many=True).data
+
+        return Response({
+            'same_topic': serialize(same_topic_ids),
+            'cross_topic': serialize(cross_topic_ids),
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def for_you(self, request):
+        """
+        "猜你喜欢"：按用户兴趣向量推荐帖子 (已过滤拉黑的作者和看过的帖子)
+        URL: /api/v1/posts/for_you/?limit=20
+        """
+        user = request.user
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+
+        post_ids = for_you_candidate_ids(user, limit)
+        if post_ids is None:
+            # 还没有兴趣数据 (新用户) 或者相似的帖子都看过了，先按默认排序返回最新的帖子
+            queryset = self.filter_queryset(self.get_queryset()).exclude(author=user)[:limit]
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        # 一次性批量取出 (get_queryset 会过滤掉拉黑的作者)，再按相似度排序
+        posts_by_id = self.get_queryset().exclude(author=user).in_bulk(post_ids)
+        posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id][:limit]
+
+        serializer = self.get_serializer(posts, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_topic_stats(apps, schema_editor):
+    Topic = apps.get_model('topics', 'Topic')
+    TopicSubscription = apps.get_model('topics', 'TopicSubscription')
+    Post = apps.get_model('posts', 'Post')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(topic=OuterRef('pk')).order_by().values('topic')
+            .annotate(count=Count('id')).values('count'),
+            output_field=IntegerField()
+        ), Value(0))
+
+    Topic.objects.update(subscribers_count=count_of(TopicSubscription), posts_count=count_of(Post))
+    Topic.objects.update(heat_score=models.F('subscribers_count') + models.F('posts_count') * 2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0006_topic_creator'),
+        ('posts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='subscribers_count',
+            field=models.IntegerField(default=0, verbose_name='订阅人数'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='posts_count',
+            field=models.IntegerField(default=0, verbose_name='帖子数'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='heat_score',
+            field=models.IntegerField(default=0, verbose_name='热度'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['-heat_score', '-created_at'], name='topic_heat_idx'),
+        ),
+        migrations.RunPython(backfill_topic_stats, migrations.RunPython.noop),
+    ]
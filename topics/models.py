@@ -29,11 +29,36 @@ class Topic(models.Model):
     # 修改：我们不需要在这里直接定义 subscribers ManyToMany
     # 因为我们下面会创建一个中间模型 TopicSubscription 来管理它，这样更灵活
 
+    # 统计数字直接存在表里 (列表 / 详情不用每次 COUNT 连表)
+    # 由 topics/signals.py (加入、发帖 / 删帖) 和 topics.utils.leave_topic (退出) 原子地加减，
+    # 定时任务 topics.tasks.reconcile_topic_stats 按实际数据校正
+    subscribers_count = models.IntegerField(default=0, verbose_name="订阅人数")
+    posts_count = models.IntegerField(default=0, verbose_name="帖子数")
+    # 热度分 = 订阅数 + 帖子数 * 2 (见 topics/utils.py)
+    heat_score = models.IntegerField(default=0, verbose_name="热度")
+
+    # 只能原子地加减的统计列：普通的 save() 不写回这些列 (见 save)
+    COUNTER_FIELDS = ('subscribers_count', 'posts_count', 'heat_score')
+
+    class Meta:
+        indexes = [
+            # 话题列表默认排序
+            models.Index(fields=['-heat_score', '-created_at'], name='topic_heat_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         # 自动根据 name 生成 slug
         if not self.slug:
             p = Pinyin()
             self.slug = p.get_pinyin(self.name, '-')
+        # 更新已有话题时 (例如 TopicViewSet 的 update / partial_update) 不写回 get_object() 时读到的统计数字，
+        # 否则会把编辑期间提交的加入 / 退出 / 发帖覆盖掉；要改统计数字请用 F() 或显式传 update_fields
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.attname not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
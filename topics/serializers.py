@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from .models import Topic, TopicSubscription
+from users.relations import SUBSCRIBED, RelationListSerializer, get_relation_resolver
+from .models import Topic
 
 
 class TopicSerializer(serializers.ModelSerializer):
-    # 1. 这是一个只读字段，由 View 中的 annotate 计算得出
+    # 1. 这是一个只读字段，存在话题表上 (见 topics/models.py)
     subscribers_count = serializers.IntegerField(read_only=True)
 
     # 2. 这是一个动态字段，判断当前用户是否已加入
@@ -14,10 +15,12 @@ class TopicSerializer(serializers.ModelSerializer):
     class Meta:
         model = Topic
         fields = ['id', 'name', 'slug', 'description', 'subscribers_count', 'is_subscribed', 'posts_count', 'icon', 'banner']
+        # 列表一次查好这一页的订阅关系 (见 users/relations.py)
+        list_serializer_class = RelationListSerializer
+
+    def prime_relations(self, resolver, topics):
+        resolver.prime(SUBSCRIBED, [topic.id for topic in topics])
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # 检查是否存在订阅记录
-            return TopicSubscription.objects.filter(user=request.user, topic=obj).exists()
-        return False
\ No newline at end of file
+        # 当前用户是否加入了这个话题
+        return get_relation_resolver(self.context.get('request')).is_subscribed(obj.id)
\ No newline at end of file
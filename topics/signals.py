@@ -0,0 +1,29 @@
+# backend/topics/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Post
+from .models import TopicSubscription
+from .utils import adjust_topic_stats
+
+
+# 统计数字和触发它的写入在同一个事务里更新 (偏差由 reconcile_topic_stats 校正)
+# 退出话题不走 post_delete 信号：并发的两次删除都会触发信号，订阅数会被扣两次，
+# 所以统一用 topics.utils.leave_topic (按 DELETE 实际删掉的行数扣)；
+# 删除用户时级联删掉的订阅由 reconcile_topic_stats 校正
+
+@receiver(post_save, sender=TopicSubscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_topic_stats(instance.topic_id, subscribers=1)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_topic_stats(instance.topic_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    adjust_topic_stats(instance.topic_id, posts=-1)
@@ -0,0 +1,62 @@
+# backend/topics/tasks.py
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Post
+from .models import Topic, TopicSubscription
+from .utils import heat_score
+
+# 每批校正多少个话题 (每批一个短事务，只锁这一批话题)
+RECONCILE_BATCH_SIZE = 100
+
+
+def reconcile_topic_batch(last_id, batch_size):
+    """
+    按实际数据重新数 id > last_id 的一批话题，只更新对不上的
+    返回 (这批的最后一个话题 ID 或 None, 修正了多少个)
+    """
+    with transaction.atomic():
+        # 先锁住这批话题再数：同时进行的加入 / 发帖要更新话题行，会等到这里提交之后，
+        # 不会出现"数的时候已经算上了、随后又被信号加一次"
+        topics = list(
+            Topic.objects.select_for_update()
+            .filter(id__gt=last_id).order_by('id')
+            .only('id', 'subscribers_count', 'posts_count', 'heat_score')[:batch_size]
+        )
+        if not topics:
+            return None, 0
+        topic_ids = [topic.id for topic in topics]
+        subscribers = dict(
+            TopicSubscription.objects.filter(topic_id__in=topic_ids)
+            .values('topic').annotate(count=Count('id')).values_list('topic', 'count')
+        )
+        posts = dict(
+            Post.objects.filter(topic_id__in=topic_ids)
+            .values('topic').annotate(count=Count('id')).values_list('topic', 'count')
+        )
+        stale = []
+        for topic in topics:
+            subscribers_count = subscribers.get(topic.id, 0)
+            posts_count = posts.get(topic.id, 0)
+            expected = (subscribers_count, posts_count, heat_score(subscribers_count, posts_count))
+            if (topic.subscribers_count, topic.posts_count, topic.heat_score) != expected:
+                topic.subscribers_count, topic.posts_count, topic.heat_score = expected
+                stale.append(topic)
+        Topic.objects.bulk_update(stale, ['subscribers_count', 'posts_count', 'heat_score'])
+    return topics[-1].id, len(stale)
+
+
+@shared_task
+def reconcile_topic_stats(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Celery 定时任务：按实际数据重新数一遍每个话题的订阅数 / 帖子数，只更新对不上的话题
+    (按话题 ID 分批，每批两条带 IN 条件的 GROUP BY，不连表)
+    """
+    last_id = 0
+    fixed = 0
+    while True:
+        last_id, batch_fixed = reconcile_topic_batch(last_id, batch_size)
+        if last_id is None:
+            return fixed
+        fixed += batch_fixed
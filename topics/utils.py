@@ -0,0 +1,36 @@
+# backend/topics/utils.py
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Topic, TopicSubscription
+
+# 热度分 = 订阅数 * HEAT_SUBSCRIBER_WEIGHT + 帖子数 * HEAT_POST_WEIGHT
+HEAT_SUBSCRIBER_WEIGHT = 1
+HEAT_POST_WEIGHT = 2
+
+
+def heat_score(subscribers_count, posts_count):
+    return subscribers_count * HEAT_SUBSCRIBER_WEIGHT + posts_count * HEAT_POST_WEIGHT
+
+
+def adjust_topic_stats(topic_id, subscribers=0, posts=0):
+    """
+    原子地调整话题的统计数字 (一条 UPDATE，在调用方的事务里执行，不会减到负数)
+    """
+    Topic.objects.filter(pk=topic_id).update(
+        subscribers_count=Greatest(F('subscribers_count') + subscribers, 0),
+        posts_count=Greatest(F('posts_count') + posts, 0),
+        heat_score=Greatest(F('heat_score') + heat_score(subscribers, posts), 0)
+    )
+
+
+def leave_topic(user_id, topic_id):
+    """
+    退出话题：只有这次 DELETE 真的删掉了一行才扣订阅数
+    (两个并发的退出请求，后一个的 DELETE 会等前一个提交，然后删到 0 行，不会重复扣)
+    返回是否删掉了
+    """
+    deleted, _ = TopicSubscription.objects.filter(user_id=user_id, topic_id=topic_id).delete()
+    if deleted:
+        adjust_topic_stats(topic_id, subscribers=-1)
+    return bool(deleted)
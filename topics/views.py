@@ -1,17 +1,17 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, F, ExpressionWrapper, IntegerField
+from django.db import transaction
 
 from .models import Topic, TopicSubscription
 from .serializers import TopicSerializer
+from .utils import leave_topic
 
 
 class TopicViewSet(viewsets.ModelViewSet):
-    #自动计算订阅人数 (subscribers_count)
-    queryset = Topic.objects.annotate(
-        subscribers_count=Count('subscriptions')
-    ).order_by('-created_at')
+    # 订阅数 / 帖子数 / 热度都是话题表上的字段 (见 topics/models.py)，列表直接按索引读
+    # 默认按热度倒序，然后是时间
+    queryset = Topic.objects.order_by('-heat_score', '-created_at')
 
     serializer_class = TopicSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -22,32 +22,19 @@ class TopicViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['heat_score', 'created_at', 'subscribers_count']  # 允许前端按这些字段排序
 
-    def get_queryset(self):
-        # (!!!) 热度算法核心逻辑 (!!!)
-        return Topic.objects.annotate(
-            # 1. 统计订阅数
-            subscribers_count=Count('subscriptions', distinct=True),
-            # 2. 统计帖子数
-            posts_count=Count('posts', distinct=True)
-        ).annotate(
-            # 3. 计算热度分 = 订阅数 + (帖子数 * 2)
-            heat_score=ExpressionWrapper(
-                F('subscribers_count') + (F('posts_count') * 2),
-                output_field=IntegerField()
-            )
-        ).order_by('-heat_score', '-created_at') # 默认按热度倒序，然后是时间
-
     #加入话题
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def join(self, request, slug=None):
         topic = self.get_object()
         user = request.user
 
-        # get_or_create 防止重复创建
-        subscription, created = TopicSubscription.objects.get_or_create(user=user, topic=topic)
+        # get_or_create 防止重复创建 (订阅数由信号在同一个事务里加一)
+        with transaction.atomic():
+            subscription, created = TopicSubscription.objects.get_or_create(user=user, topic=topic)
 
         if created:
-            return Response({'status': 'joined', 'subscribers_count': topic.subscriptions.count()},
+            topic.refresh_from_db(fields=['subscribers_count'])
+            return Response({'status': 'joined', 'subscribers_count': topic.subscribers_count},
                             status=status.HTTP_201_CREATED)
         else:
             return Response({'status': 'already_joined'}, status=status.HTTP_200_OK)
@@ -58,10 +45,11 @@ class TopicViewSet(viewsets.ModelViewSet):
         topic = self.get_object()
         user = request.user
 
-        try:
-            sub = TopicSubscription.objects.get(user=user, topic=topic)
-            sub.delete()
-            return Response({'status': 'left', 'subscribers_count': topic.subscriptions.count()},
-                            status=status.HTTP_200_OK)
-        except TopicSubscription.DoesNotExist:
-            return Response({'status': 'not_joined'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        # 按实际删掉的行数扣订阅数 (并发的两次退出只会扣一次)
+        with transaction.atomic():
+            left = leave_topic(user.id, topic.id)
+        if not left:
+            return Response({'status': 'not_joined'}, status=status.HTTP_400_BAD_REQUEST)
+        topic.refresh_from_db(fields=['subscribers_count'])
+        return Response({'status': 'left', 'subscribers_count': topic.subscribers_count},
+                        status=status.HTTP_200_OK)
\ No newline at end of file
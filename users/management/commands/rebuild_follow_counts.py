@@ -0,0 +1,32 @@
+# backend/users/management/commands/rebuild_follow_counts.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.tasks import REBUILD_BATCH_SIZE
+from users.utils import rebuild_follow_counts_batch
+
+
+class Command(BaseCommand):
+    help = '按 UserFollow 重新计算每个用户的粉丝数 / 关注数 (只更新对不上的用户)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help='每批处理的用户数')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        checked = 0
+        fixed = 0
+        started_at = time.monotonic()
+        while True:
+            # 键集分页，每批一个短事务
+            last_id, batch_checked, batch_fixed = rebuild_follow_counts_batch(last_id, options['batch_size'])
+            if last_id is None:
+                break
+            checked += batch_checked
+            fixed += batch_fixed
+            self.stdout.write(f'已检查 {checked} 个用户，修正 {fixed} 个')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：检查 {checked} 个用户，修正 {fixed} 个，用时 {time.monotonic() - started_at:.1f} 秒'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserFollow = apps.get_model('users', 'UserFollow')
+
+    def count_by(field):
+        return Coalesce(Subquery(
+            UserFollow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+            .annotate(count=Count('id')).values('count'),
+            output_field=IntegerField()
+        ), Value(0))
+
+    User.objects.update(followers_count=count_by('followed'), following_count=count_by('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_is_created_topics_public_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, verbose_name='粉丝数'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.IntegerField(default=0, verbose_name='关注数'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-followers_count'], name='user_followers_count_idx'),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
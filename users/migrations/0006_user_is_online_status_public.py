@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_online_status_public',
+            field=models.BooleanField(default=True, verbose_name='公开在线状态'),
+        ),
+    ]
@@ -19,6 +19,33 @@ class User(AbstractUser):
     is_following_public = models.BooleanField(default=True, verbose_name="公开关注列表")
     is_joined_topics_public = models.BooleanField(default=True, verbose_name="公开加入的话题")
     is_created_topics_public = models.BooleanField(default=True, verbose_name="公开创建的话题")
+    is_online_status_public = models.BooleanField(default=True, verbose_name="公开在线状态")
+
+    # 粉丝数 / 关注数直接存在用户表上 (用户列表不用每次对 UserFollow 做聚合)
+    # 关注 / 取关时原子地加减 (users/signals.py、users.utils.unfollow)，
+    # 定时任务 users.tasks.rebuild_follow_counts 校正，也可以手动 python manage.py rebuild_follow_counts
+    followers_count = models.IntegerField(default=0, verbose_name="粉丝数")
+    following_count = models.IntegerField(default=0, verbose_name="关注数")
+
+    # 只能原子地加减的计数器：普通的 save() 不写回这些列 (见 save)
+    COUNTER_FIELDS = ('followers_count', 'following_count')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # 用户列表默认按粉丝数倒序
+            models.Index(fields=['-followers_count'], name='user_followers_count_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # 更新已有用户时 (例如修改资料 PATCH /auth/users/me/) 不写回实例加载时读到的计数器，
+        # 否则会把这期间提交的关注 / 取关覆盖掉；要改计数器请用 F() 或显式传 update_fields
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.attname not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.username
@@ -0,0 +1,282 @@
+# backend/users/presence.py
+"""
+在线状态 (presence)
+
+每个 WebSocket 连接登记为一条"带过期时间的连接记录"，连接存活期间定时心跳续期：
+- 用户的连接数 > 0 即在线；断开时删除自己的那条记录
+- worker 崩溃来不及清理时，记录会在 CONNECTION_TTL 之后自动过期，不会一直"假在线"
+- 最后在线时间 (last seen) 在每次连接 / 心跳 / 断开时刷新
+
+房间占用 (room occupancy) 用同样的方式统计某个组 (比如帖子页 post_{id}) 里有多少个连接，
+不要求登录；没人在看的房间可以直接跳过广播
+
+后端通过 settings.PRESENCE_BACKEND 选择：
+- users.presence.RedisPresenceBackend   (默认，多个 worker 共享)
+- users.presence.InMemoryPresenceBackend (单进程，测试 / 本地开发用)
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# 连接记录的有效期，以及心跳间隔 (秒)
+CONNECTION_TTL = 60
+HEARTBEAT_INTERVAL = 20
+# 最后在线时间保留多久
+LAST_SEEN_TTL = 60 * 60 * 24 * 30
+
+
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc) if timestamp else None
+
+
+class RedisPresenceBackend:
+    """
+    每个用户一个有序集合 presence:conn:{user_id}
+    成员是连接的 channel_name，分数是这条连接的过期时间戳
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+
+    def _connections_key(self, user_id):
+        return f'presence:conn:{user_id}'
+
+    def _last_seen_key(self, user_id):
+        return f'presence:last_seen:{user_id}'
+
+    def connect(self, user_id, channel_name):
+        now = time.time()
+        key = self._connections_key(user_id)
+        pipe = self.redis.pipeline()
+        # 顺便清掉已经过期的连接 (崩溃的 worker 留下的)
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zadd(key, {channel_name: now + CONNECTION_TTL})
+        pipe.expire(key, CONNECTION_TTL)
+        pipe.set(self._last_seen_key(user_id), now, ex=LAST_SEEN_TTL)
+        pipe.execute()
+
+    # 心跳就是重新登记一次 (续期)
+    heartbeat = connect
+
+    def disconnect(self, user_id, channel_name):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._connections_key(user_id), channel_name)
+        pipe.set(self._last_seen_key(user_id), time.time(), ex=LAST_SEEN_TTL)
+        pipe.execute()
+
+    def online_user_ids(self, user_ids):
+        """
+        批量判断在线，返回其中在线的用户 ID 集合 (一次往返)
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        now = time.time()
+        pipe = self.redis.pipeline()
+        for user_id in user_ids:
+            pipe.zcount(self._connections_key(user_id), now, '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+    def is_online(self, user_id):
+        return bool(self.online_user_ids([user_id]))
+
+    def lookup(self, user_ids):
+        """
+        批量查询在线状态和最后在线时间：{user_id: {'online': bool, 'last_seen': datetime | None}}
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        online = self.online_user_ids(user_ids)
+        last_seen = self.redis.mget([self._last_seen_key(user_id) for user_id in user_ids])
+        return {
+            user_id: {'online': user_id in online, 'last_seen': _to_datetime(seen)}
+            for user_id, seen in zip(user_ids, last_seen)
+        }
+
+    # ----- 房间占用：每个房间一个有序集合 presence:room:{room}，结构和连接记录相同 -----
+
+    def _room_key(self, room):
+        return f'presence:room:{room}'
+
+    def enter_rooms(self, rooms, channel_name):
+        # 进入房间和心跳续期都是重新登记一次
+        now = time.time()
+        pipe = self.redis.pipeline()
+        for room in rooms:
+            key = self._room_key(room)
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.zadd(key, {channel_name: now + CONNECTION_TTL})
+            pipe.expire(key, CONNECTION_TTL)
+        pipe.execute()
+
+    def leave_rooms(self, rooms, channel_name):
+        pipe = self.redis.pipeline()
+        for room in rooms:
+            pipe.zrem(self._room_key(room), channel_name)
+        pipe.execute()
+
+    def room_occupancy(self, room):
+        return self.redis.zcount(self._room_key(room), time.time(), '+inf')
+
+
+class InMemoryPresenceBackend:
+    """
+    进程内实现，语义和 RedisPresenceBackend 相同 (只在单进程内有效)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = {}  # user_id -> {channel_name: 过期时间戳}
+        self.last_seen = {}    # user_id -> 时间戳
+        self.rooms = {}        # room -> {channel_name: 过期时间戳}
+
+    def connect(self, user_id, channel_name):
+        now = time.time()
+        with self.lock:
+            self.connections.setdefault(user_id, {})[channel_name] = now + CONNECTION_TTL
+            self.last_seen[user_id] = now
+
+    heartbeat = connect
+
+    def disconnect(self, user_id, channel_name):
+        with self.lock:
+            self.connections.get(user_id, {}).pop(channel_name, None)
+            self.last_seen[user_id] = time.time()
+
+    def online_user_ids(self, user_ids):
+        now = time.time()
+        with self.lock:
+            return {
+                user_id for user_id in user_ids
+                if any(expires > now for expires in self.connections.get(user_id, {}).values())
+            }
+
+    def is_online(self, user_id):
+        return bool(self.online_user_ids([user_id]))
+
+    def lookup(self, user_ids):
+        user_ids = list(user_ids)
+        online = self.online_user_ids(user_ids)
+        return {
+            user_id: {'online': user_id in online, 'last_seen': _to_datetime(self.last_seen.get(user_id))}
+            for user_id in user_ids
+        }
+
+    def enter_rooms(self, rooms, channel_name):
+        expires = time.time() + CONNECTION_TTL
+        with self.lock:
+            for room in rooms:
+                self.rooms.setdefault(room, {})[channel_name] = expires
+
+    def leave_rooms(self, rooms, channel_name):
+        with self.lock:
+            for room in rooms:
+                self.rooms.get(room, {}).pop(channel_name, None)
+
+    def room_occupancy(self, room):
+        now = time.time()
+        with self.lock:
+            return sum(1 for expires in self.rooms.get(room, {}).values() if expires > now)
+
+
+@lru_cache(maxsize=None)
+def get_presence():
+    """
+    返回当前配置的在线状态后端 (进程内单例)
+    """
+    return import_string(settings.PRESENCE_BACKEND)()
+
+
+class PresenceMixin:
+    """
+    给 WebSocket Consumer 用：accept 之后调用 presence_connect()，disconnect 里调用 presence_disconnect()
+    连接期间每 HEARTBEAT_INTERVAL 秒自动续期一次
+    """
+
+    async def presence_connect(self):
+        presence = get_presence()
+        # 不涉及数据库，thread_sensitive=False 让它在线程池里执行，不和数据库操作排队
+        await sync_to_async(presence.connect, thread_sensitive=False)(self.user.id, self.channel_name)
+        self._presence_task = asyncio.create_task(self._presence_heartbeat())
+
+    async def presence_disconnect(self):
+        task = getattr(self, '_presence_task', None)
+        if task is None:
+            # 没有登记过 (例如连接在 connect 阶段就被拒绝了)
+            return
+        task.cancel()
+        self._presence_task = None
+        presence = get_presence()
+        await sync_to_async(presence.disconnect, thread_sensitive=False)(self.user.id, self.channel_name)
+
+    async def _presence_heartbeat(self):
+        presence = get_presence()
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await sync_to_async(presence.heartbeat, thread_sensitive=False)(self.user.id, self.channel_name)
+            except Exception:
+                # Redis 暂时不可用时记下来，下一次心跳再试 (不能让续期任务悄悄退出)
+                logger.warning('presence heartbeat failed for user %s', self.user.id, exc_info=True)
+
+
+class RoomOccupancyMixin:
+    """
+    给 WebSocket Consumer 用：加入某个组时调用 room_enter()，离开时 room_exit()，disconnect 里 room_exit_all()
+    (不要求登录，匿名看帖子的也算)。连接期间每 HEARTBEAT_INTERVAL 秒自动续期一次
+    """
+
+    @property
+    def occupied_rooms(self):
+        if not hasattr(self, '_occupied_rooms'):
+            self._occupied_rooms = set()
+        return self._occupied_rooms
+
+    async def room_enter(self, room):
+        presence = get_presence()
+        await sync_to_async(presence.enter_rooms, thread_sensitive=False)([room], self.channel_name)
+        self.occupied_rooms.add(room)
+        if getattr(self, '_room_task', None) is None:
+            self._room_task = asyncio.create_task(self._room_heartbeat())
+
+    async def room_exit(self, room):
+        if room not in self.occupied_rooms:
+            return
+        self.occupied_rooms.discard(room)
+        presence = get_presence()
+        await sync_to_async(presence.leave_rooms, thread_sensitive=False)([room], self.channel_name)
+
+    async def room_exit_all(self):
+        task = getattr(self, '_room_task', None)
+        if task is not None:
+            task.cancel()
+            self._room_task = None
+        rooms = list(self.occupied_rooms)
+        self.occupied_rooms.clear()
+        if rooms:
+            presence = get_presence()
+            await sync_to_async(presence.leave_rooms, thread_sensitive=False)(rooms, self.channel_name)
+
+    async def _room_heartbeat(self):
+        presence = get_presence()
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            if not self.occupied_rooms:
+                continue
+            try:
+                await sync_to_async(presence.enter_rooms, thread_sensitive=False)(
+                    list(self.occupied_rooms), self.channel_name
+                )
+            except Exception:
+                logger.warning('room occupancy heartbeat failed for %s', self.channel_name, exc_info=True)
@@ -0,0 +1,91 @@
+# backend/users/relations.py
+"""
+当前用户和列表里每一行的关系 (是否关注 / 是否拉黑 / 是否加入话题)
+
+以前每个序列化器字段各查一次 EXISTS，一页 50 行就是 50~100 条查询。
+现在每个请求一个 RelationResolver：列表序列化时先用 RelationListSerializer
+把这一页的 ID 一次性查好 (每种关系一条查询)，字段再从内存里读；
+详情页 (单个对象) 没有预加载，按需查那一个 ID，结果同样缓存到请求结束
+"""
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import serializers
+
+from .models import UserBlock, UserFollow
+
+FOLLOWING = 'following'
+BLOCKING = 'blocking'
+SUBSCRIBED = 'subscribed'
+
+
+class RelationResolver:
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.known = {}  # 关系 -> {对象 ID: bool}
+
+    def lookup(self, relation):
+        """
+        返回 (当前用户这一侧的查询集, 对方 ID 的字段名)
+        """
+        if relation == FOLLOWING:
+            return UserFollow.objects.filter(follower_id=self.viewer.id), 'followed_id'
+        if relation == BLOCKING:
+            return UserBlock.objects.filter(blocker_id=self.viewer.id), 'blocked_id'
+        if relation == SUBSCRIBED:
+            from topics.models import TopicSubscription  # 局部导入防止循环引用
+            return TopicSubscription.objects.filter(user_id=self.viewer.id), 'topic_id'
+        raise ValueError(f'未知的关系: {relation}')
+
+    def prime(self, relation, object_ids):
+        """
+        一条查询查好一批 ID (已经查过的不再查)
+        """
+        known = self.known.setdefault(relation, {})
+        missing = {object_id for object_id in object_ids if object_id not in known}
+        if not missing:
+            return
+        if not self.viewer.is_authenticated:
+            known.update(dict.fromkeys(missing, False))
+            return
+        queryset, field = self.lookup(relation)
+        found = set(queryset.filter(**{f'{field}__in': missing}).values_list(field, flat=True))
+        for object_id in missing:
+            known[object_id] = object_id in found
+
+    def has(self, relation, object_id):
+        self.prime(relation, [object_id])
+        return self.known[relation][object_id]
+
+    def is_following(self, user_id):
+        return self.has(FOLLOWING, user_id)
+
+    def is_blocking(self, user_id):
+        return self.has(BLOCKING, user_id)
+
+    def is_subscribed(self, topic_id):
+        return self.has(SUBSCRIBED, topic_id)
+
+
+def get_relation_resolver(request):
+    """
+    同一个请求共用一个 RelationResolver (挂在 request 上)
+    """
+    if request is None:
+        return RelationResolver(AnonymousUser())
+    resolver = getattr(request, '_relation_resolver', None)
+    if resolver is None:
+        resolver = RelationResolver(request.user)
+        request._relation_resolver = resolver
+    return resolver
+
+
+class RelationListSerializer(serializers.ListSerializer):
+    """
+    列表序列化前先调用 child.prime_relations(resolver, 这一页的对象)，把关系一次性查好
+    用法：在序列化器的 Meta 里设置 list_serializer_class = RelationListSerializer
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.child.prime_relations(get_relation_resolver(self.context.get('request')), items)
+        return super().to_representation(items)
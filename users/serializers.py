@@ -1,7 +1,8 @@
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from rest_framework import serializers
-from .models import User, UserFollow, MerchantProfile
+from .models import User, MerchantProfile
+from .relations import BLOCKING, FOLLOWING, RelationListSerializer, get_relation_resolver
 
 class UserCreateSerializer(BaseUserCreateSerializer):
     """
@@ -23,13 +24,15 @@ class UserSerializer(BaseUserSerializer):
                   'is_followers_public',
                   'is_following_public',
                   'is_joined_topics_public',
-                  'is_created_topics_public'
+                  'is_created_topics_public',
+                  'is_online_status_public'
                   )
 
 class ProfileSerializer(serializers.ModelSerializer):
     """
     用于公开展示的用户个人主页信息
     """
+    # 计数器字段，只读 (关注 / 取关时维护，见 users/models.py)
     followers_count = serializers.IntegerField(read_only=True)
     following_count = serializers.IntegerField(read_only=True)
     is_followed = serializers.SerializerMethodField()
@@ -40,22 +43,21 @@ class ProfileSerializer(serializers.ModelSerializer):
         model = User
         # 我们只暴露公开字段，绝不要暴露 email 或 password
         fields = ['id', 'username', 'date_joined', 'followers_count', 'following_count', 'is_followed', 'is_blocked', 'avatar']
+        # 列表一次查好这一页的关注 / 拉黑关系 (见 users/relations.py)
+        list_serializer_class = RelationListSerializer
+
+    def prime_relations(self, resolver, users):
+        user_ids = [user.id for user in users]
+        resolver.prime(FOLLOWING, user_ids)
+        resolver.prime(BLOCKING, user_ids)
 
     def get_is_followed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # 检查当前登录用户 (request.user) 是否关注了该用户 (obj)
-            # user_follow 表中: follower=我, followed=他
-            return UserFollow.objects.filter(follower=request.user, followed=obj).exists()
-        return False
+        # 当前登录用户 (request.user) 是否关注了该用户 (obj)
+        return get_relation_resolver(self.context.get('request')).is_following(obj.id)
 
     def get_is_blocked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # 检查我 (request.user) 是否拉黑了他 (obj)
-            from .models import UserBlock  # 局部导入防止循环引用
-            return UserBlock.objects.filter(blocker=request.user, blocked=obj).exists()
-        return False
+        # 我 (request.user) 是否拉黑了他 (obj)
+        return get_relation_resolver(self.context.get('request')).is_blocking(obj.id)
 
 class MerchantProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,17 @@
+# backend/users/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import UserFollow
+from .utils import adjust_follow_counts
+
+
+# 新关注在同一个事务里给两边的计数器加一 (唯一约束保证同一对用户只会成功创建一次)
+# 取关不走 post_delete 信号：并发的两次删除都会触发信号，计数器会被扣两次，
+# 所以取关统一用 users.utils.unfollow (按 DELETE 实际删掉的行数扣)；
+# 删除用户时级联删掉的关注由定时任务 users.tasks.rebuild_follow_counts 校正
+
+@receiver(post_save, sender=UserFollow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_follow_counts(instance.follower_id, instance.followed_id, 1)
@@ -0,0 +1,20 @@
+# backend/users/tasks.py
+from celery import shared_task
+
+from .utils import rebuild_follow_counts_batch
+
+REBUILD_BATCH_SIZE = 1000
+
+
+@shared_task
+def rebuild_follow_counts(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Celery 定时任务：按 UserFollow 校正所有用户的粉丝数 / 关注数 (分批加锁，只更新对不上的)
+    """
+    last_id = 0
+    fixed = 0
+    while True:
+        last_id, _, batch_fixed = rebuild_follow_counts_batch(last_id, batch_size)
+        if last_id is None:
+            return fixed
+        fixed += batch_fixed
@@ -0,0 +1,69 @@
+# backend/users/utils.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, When
+from django.db.models.functions import Greatest
+
+from .models import UserFollow
+
+User = get_user_model()
+
+
+def adjust_follow_counts(follower_id, followed_id, delta):
+    """
+    关注 (+1) / 取关 (-1) 时原子地调整两边的计数器 (不会减到负数)
+    一条 UPDATE 同时改两行 (在调用方的事务里执行)，互相关注时也不会因为加锁顺序不同而死锁
+    """
+    User.objects.filter(pk__in=[follower_id, followed_id]).update(
+        following_count=Case(
+            When(pk=follower_id, then=Greatest(F('following_count') + delta, 0)), default=F('following_count')
+        ),
+        followers_count=Case(
+            When(pk=followed_id, then=Greatest(F('followers_count') + delta, 0)), default=F('followers_count')
+        )
+    )
+
+
+def unfollow(follower_id, followed_id):
+    """
+    取消关注：只有这次 DELETE 真的删掉了一行才扣计数器
+    (两个并发的取关请求，后一个的 DELETE 会等前一个提交，然后删到 0 行，不会重复扣)
+    返回是否删掉了
+    """
+    deleted, _ = UserFollow.objects.filter(follower_id=follower_id, followed_id=followed_id).delete()
+    if deleted:
+        adjust_follow_counts(follower_id, followed_id, -1)
+    return bool(deleted)
+
+
+def rebuild_follow_counts_batch(last_id, batch_size):
+    """
+    按 UserFollow 重新计算 id > last_id 的一批用户的计数器，只更新对不上的
+    返回 (这批的最后一个用户 ID 或 None, 检查了多少个, 修正了多少个)
+    """
+    # 每批一个短事务：先锁住这批用户再数，避免和同时进行的关注 / 取关互相覆盖
+    with transaction.atomic():
+        users = list(
+            User.objects.select_for_update()
+            .filter(id__gt=last_id).order_by('id')
+            .only('id', 'followers_count', 'following_count')[:batch_size]
+        )
+        if not users:
+            return None, 0, 0
+        user_ids = [user.id for user in users]
+        followers = dict(
+            UserFollow.objects.filter(followed_id__in=user_ids)
+            .values('followed').annotate(count=Count('id')).values_list('followed', 'count')
+        )
+        following = dict(
+            UserFollow.objects.filter(follower_id__in=user_ids)
+            .values('follower').annotate(count=Count('id')).values_list('follower', 'count')
+        )
+        stale = []
+        for user in users:
+            counts = (followers.get(user.id, 0), following.get(user.id, 0))
+            if (user.followers_count, user.following_count) != counts:
+                user.followers_count, user.following_count = counts
+                stale.append(user)
+        User.objects.bulk_update(stale, ['followers_count', 'following_count'])
+    return users[-1].id, len(users), len(stale)
@@ -2,16 +2,22 @@
 from rest_framework import viewsets, permissions, status, mixins, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from rest_framework.exceptions import ValidationError
 
 from .models import UserFollow, UserBlock, MerchantProfile
+from .presence import get_presence
 from .serializers import ProfileSerializer, UserSerializer, MerchantProfileSerializer
+from .utils import unfollow
 
 User = get_user_model()
 
+# 在线状态批量查询一次最多多少个用户
+PRESENCE_LOOKUP_LIMIT = 200
+
 class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.ListModelMixin):
     """
     只读视图集，用于查看用户资料和关注/取消关注。
@@ -28,12 +34,7 @@ class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.
     ordering_fields = ['followers_count', 'date_joined']
     ordering = ['-followers_count']  # 默认按粉丝数倒序 (即高粉丝数在前)
 
-    def get_queryset(self):
-        # 预先计算粉丝数和关注数
-        return User.objects.annotate(
-            followers_count=Count('followers', distinct=True),
-            following_count=Count('following', distinct=True)
-        )
+    # 粉丝数和关注数是用户表上的字段 (见 users/models.py)，默认排序走 user_followers_count_idx
 
     # 动作: 关注/取消关注
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -44,8 +45,12 @@ class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.
         if target_user == follower:
             return Response({'detail': '你不能关注你自己。'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # get_or_create 实现关注
-        follow_obj, created = UserFollow.objects.get_or_create(follower=follower, followed=target_user)
+        # get_or_create 实现关注 (计数器由信号在同一个事务里加一)
+        with transaction.atomic():
+            follow_obj, created = UserFollow.objects.get_or_create(follower=follower, followed=target_user)
+            if not created:
+                # 按实际删掉的行数扣计数器 (并发的两次取关只会扣一次)
+                unfollow(follower.id, target_user.id)
 
         if created:
             return Response({'status': 'followed'}, status=status.HTTP_201_CREATED)
@@ -55,7 +60,6 @@ class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.
             # 但为了保持一致性，我们还是用 "如果已存在则返回已关注" 或者是 "取消关注"？
             # 让我们模仿 topic 的逻辑：再次请求不删除，而是返回状态。删除用单独逻辑？
             # 不，为了简单，我们这里实现 "Toggle" (切换)：点一下关注，再点一下取消。
-            follow_obj.delete()
             return Response({'status': 'unfollowed'}, status=status.HTTP_200_OK)
 
     # ---------------------------------------------------------
@@ -68,18 +72,21 @@ class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.
         if target_user == blocker:
             return Response({'detail': '你不能拉黑你自己。'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 拉黑逻辑: 创建记录
-        block_obj, created = UserBlock.objects.get_or_create(blocker=blocker, blocked=target_user)
+        with transaction.atomic():
+            # 拉黑逻辑: 创建记录
+            block_obj, created = UserBlock.objects.get_or_create(blocker=blocker, blocked=target_user)
+
+            if created:
+                # (可选) 强力拉黑: 如果拉黑了，自动取关 (两个方向各自按实际删掉的行数扣计数器)
+                unfollow(blocker.id, target_user.id)
+                unfollow(target_user.id, blocker.id)
+            else:
+                # 如果已经拉黑，再次点击则是取消拉黑
+                block_obj.delete()
 
         if created:
-            # (可选) 强力拉黑: 如果拉黑了，自动取关
-            UserFollow.objects.filter(follower=blocker, followed=target_user).delete()
-            UserFollow.objects.filter(follower=target_user, followed=blocker).delete()
             return Response({'status': 'blocked'}, status=status.HTTP_201_CREATED)
-        else:
-            # 如果已经拉黑，再次点击则是取消拉黑
-            block_obj.delete()
-            return Response({'status': 'unblocked'}, status=status.HTTP_200_OK)
+        return Response({'status': 'unblocked'}, status=status.HTTP_200_OK)
 
     # ---------------------------------------------------------
     # 3. 获取粉丝列表 (带隐私检查)
@@ -127,6 +134,40 @@ class ProfileViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.
         serializer = UserSerializer(following, many=True)
         return Response(serializer.data)
 
+    # ---------------------------------------------------------
+    # 5. 批量查询在线状态
+    # URL: /api/v1/profiles/presence/?ids=1,2,3
+    # ---------------------------------------------------------
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def presence(self, request):
+        try:
+            user_ids = [int(x) for x in request.query_params.get('ids', '').split(',') if x]
+        except ValueError:
+            return Response({'detail': 'ids 必须是逗号分隔的用户 ID'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > PRESENCE_LOOKUP_LIMIT:
+            return Response({'detail': f'一次最多查询 {PRESENCE_LOOKUP_LIMIT} 个用户'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 拉黑关系 (任一方向) 和不公开在线状态的用户不返回 (自己除外)，一条查询
+        user = request.user
+        visible_ids = set(
+            User.objects.filter(id__in=user_ids)
+            .filter(Q(is_online_status_public=True) | Q(id=user.id))
+            .exclude(blocking__blocked=user)
+            .exclude(blocked_by__blocker=user)
+            .values_list('id', flat=True)
+        )
+        user_ids = [user_id for user_id in user_ids if user_id in visible_ids]
+
+        # 在线状态只查 Redis
+        statuses = get_presence().lookup(dict.fromkeys(user_ids))
+        return Response({
+            str(user_id): {
+                'online': status_['online'],
+                'last_seen': status_['last_seen'].isoformat() if status_['last_seen'] else None,
+            }
+            for user_id, status_ in statuses.items()
+        })
+
 class MerchantViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin):
     """
     商家接口：